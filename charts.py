@@ -0,0 +1,189 @@
+import math
+
+# Gráfico de pizza da distribuição de tempo por área.
+# A geometria das fatias é calculada aqui, sem Matplotlib, para ser
+# compartilhada pelas interfaces; o gráfico do Tkinter é uma figura única e
+# persistente cujas fatias são alteradas no lugar e redesenhadas por blitting,
+# e o da versão Flet é desenhado nativamente no cliente. O Matplotlib só é
+# importado quando um desses gráficos (ou a exportação em PNG) é usado.
+
+EMPTY_CHART_TEXT = "Nenhum tempo registrado para exibir o gráfico."
+
+
+def pie_slices(sizes, startangle=90):
+    # Fatias (índice, fração, ângulo inicial, ângulo final) em graus, no sentido
+    # anti-horário a partir de `startangle`, ignorando áreas com tempo zero
+    total = sum(sizes)
+    slices = []
+    if total <= 0:
+        return slices
+    theta = startangle
+    for index, size in enumerate(sizes):
+        if size > 0:
+            fraction = size / total
+            slices.append((index, fraction, theta, theta + 360 * fraction))
+            theta += 360 * fraction
+    return slices
+
+
+class TkPieChart:
+    # Figura, canvas e barra de ferramentas criados uma única vez; a cada
+    # atualização só as fatias e os textos mudam
+    def __init__(self, master, zones, label_distance=1.1, pct_distance=0.85):
+        from matplotlib.figure import Figure
+        from matplotlib.patches import Wedge
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+
+        self.zones = zones
+        self.label_distance = label_distance
+        self.pct_distance = pct_distance
+
+        self.figure = Figure(figsize=(5, 4), dpi=100) # Tamanho da figura (largura, altura)
+        self.ax = self.figure.add_subplot(111)
+        self.ax.set_xlim(-1.25, 1.25)
+        self.ax.set_ylim(-1.25, 1.25)
+        self.ax.set_aspect("equal") # Garante que o círculo seja desenhado como um círculo.
+        self.ax.axis("off")
+        self.ax.set_title("Distribuição de Tempo por Área")
+
+        # Artistas animados não entram no desenho completo da figura; são
+        # desenhados por cima do fundo salvo (blitting)
+        self.wedges = []
+        self.labels = []
+        self.pct_texts = []
+        for zone in zones:
+            wedge = Wedge((0, 0), 1, 90, 90, facecolor=zone.color, animated=True, visible=False)
+            self.ax.add_patch(wedge)
+            self.wedges.append(wedge)
+            self.labels.append(self.ax.text(0, 0, zone.name, fontsize=10, animated=True, visible=False))
+            self.pct_texts.append(self.ax.text(0, 0, "", fontsize=10, color="black", ha="center",
+                                               va="center", animated=True, visible=False))
+        self.empty_text = self.ax.text(0, 0, EMPTY_CHART_TEXT, color="gray", ha="center", va="center",
+                                       animated=True)
+        self.artists = self.wedges + self.labels + self.pct_texts + [self.empty_text]
+
+        self.canvas = FigureCanvasTkAgg(self.figure, master=master)
+        self.background = None
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+        canvas_widget = self.canvas.get_tk_widget()
+        canvas_widget.pack(side="top", fill="both", expand=True)
+
+        # Adiciona a barra de ferramentas do Matplotlib (zoom, pan, save)
+        self.toolbar = NavigationToolbar2Tk(self.canvas, master)
+        self.toolbar.update()
+        canvas_widget.pack(side="top", fill="both", expand=True) # Repack para garantir que a barra de ferramentas apareça
+        self.canvas.draw_idle()
+
+    def update(self, sizes):
+        for artist in self.artists:
+            artist.set_visible(False)
+
+        slices = pie_slices(sizes)
+        self.empty_text.set_visible(not slices)
+        for index, fraction, theta1, theta2 in slices:
+            self.wedges[index].set_theta1(theta1)
+            self.wedges[index].set_theta2(theta2)
+            self.wedges[index].set_visible(True)
+
+            angle = math.radians((theta1 + theta2) / 2)
+            x, y = math.cos(angle), math.sin(angle)
+            label = self.labels[index]
+            label.set_position((self.label_distance * x, self.label_distance * y))
+            label.set_horizontalalignment("left" if x > 0 else "right")
+            label.set_verticalalignment("bottom" if y > 0 else "top")
+            label.set_visible(True)
+            pct_text = self.pct_texts[index]
+            pct_text.set_position((self.pct_distance * x, self.pct_distance * y))
+            pct_text.set_text(f"{fraction * 100:.1f}%")
+            pct_text.set_visible(True)
+
+        self._blit()
+
+    def _on_draw(self, event):
+        # Desenho completo (primeira exibição, redimensionamento): salva o fundo
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self._draw_artists()
+
+    def _draw_artists(self):
+        for artist in self.artists:
+            if artist.get_visible():
+                self.ax.draw_artist(artist)
+
+    def _blit(self):
+        if self.background is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self.background)
+        self._draw_artists()
+        self.canvas.blit(self.figure.bbox)
+
+
+class FletPieChart:
+    # Gráfico desenhado nativamente pelo cliente Flet (ft.PieChart): as seções
+    # são criadas uma vez e só os valores e títulos das fatias trafegam a
+    # cada atualização, em vez de uma imagem PNG em base64
+    def __init__(self, zones, radius=110):
+        import flet as ft
+        from flet import PieChart, PieChartSection
+
+        self.sections = [
+            PieChartSection(
+                0,
+                title="",
+                color=zone.flet_color,
+                radius=radius,
+                title_style=ft.TextStyle(size=11, color="#FFFFFF", weight=ft.FontWeight.BOLD),
+            )
+            for zone in zones
+        ]
+        self.zones = zones
+        self.chart = PieChart(
+            sections=self.sections,
+            sections_space=0,
+            center_space_radius=0,
+            start_degree_offset=-90, # Primeira fatia começa no topo, como no Tkinter
+            visible=False,
+        )
+        self.empty_text = ft.Text(EMPTY_CHART_TEXT, text_align=ft.TextAlign.CENTER)
+        self.control = ft.Stack([self.chart, self.empty_text], alignment=ft.alignment.center)
+
+    def update(self, sizes):
+        fractions = {index: fraction for index, fraction, _, _ in pie_slices(sizes)}
+        for index, (zone, section) in enumerate(zip(self.zones, self.sections)):
+            fraction = fractions.get(index, 0)
+            section.value = fraction
+            section.title = f"{zone.name}\n{fraction * 100:.1f}%" if fraction else ""
+        self.chart.visible = bool(fractions)
+        self.empty_text.visible = not fractions
+
+
+def save_pie_png(path, zones, sizes):
+    # Exportação do gráfico para arquivo com Matplotlib (sem pyplot, então a
+    # figura não fica registrada globalmente). Retorna False se não há dados
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    slices = pie_slices(sizes)
+    if not slices:
+        return False
+
+    figure = Figure(figsize=(6, 5))
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot(111)
+    wedges, texts, autotexts = ax.pie(
+        [sizes[index] for index, _, _, _ in slices],
+        labels=[zones[index].name for index, _, _, _ in slices],
+        colors=[zones[index].color for index, _, _, _ in slices],
+        autopct='%1.1f%%',
+        startangle=90,
+        pctdistance=0.85
+    )
+    for autotext in autotexts:
+        autotext.set_color('black')
+        autotext.set_fontsize(10)
+    for text in texts:
+        text.set_fontsize(10)
+    ax.axis('equal')
+    ax.set_title("Distribuição de Tempo por Área", fontsize=12, fontweight='bold')
+    figure.savefig(path, format='png', bbox_inches='tight', dpi=100)
+    return True
@@ -0,0 +1,85 @@
+import time
+
+# Fontes de tempo para a contabilidade das áreas.
+# Um relógio é qualquer chamável sem argumentos que retorna nanossegundos
+# inteiros de uma escala monotônica; o motor nunca usa o relógio de parede,
+# então ajustes de NTP ou mudanças manuais de hora não afetam as medidas.
+
+NS_PER_SECOND = 1_000_000_000
+
+# Relógio padrão: monotônico e com a maior resolução disponível
+default_clock = time.perf_counter_ns
+monotonic_clock = time.monotonic_ns
+
+
+def to_seconds(ns):
+    return ns / NS_PER_SECOND
+
+
+def seconds_to_ns(seconds):
+    return int(round(seconds * NS_PER_SECOND))
+
+
+class FakeClock:
+    # Relógio controlado manualmente, para simular sessões sem esperar
+    def __init__(self, start_ns=0):
+        self.now_ns = start_ns
+
+    def __call__(self):
+        return self.now_ns
+
+    def advance(self, seconds):
+        self.now_ns += seconds_to_ns(seconds)
+
+    def advance_ns(self, ns):
+        self.now_ns += ns
+
+
+class ScaledClock:
+    # Relógio acelerado: cada segundo real equivale a `speed` segundos simulados
+    def __init__(self, speed, source=default_clock):
+        self.speed = speed
+        self.source = source
+        self.origin = source()
+
+    def __call__(self):
+        return int((self.source() - self.origin) * self.speed)
+
+
+class EventClock:
+    # Converte o carimbo de tempo dos eventos da interface (event.time do Tk:
+    # milissegundos de 32 bits do servidor gráfico, que voltam a zero a cada
+    # ~49,7 dias) para o relógio do motor, para que a espera do evento na fila
+    # não seja contabilizada como tempo na área.
+    # O deslocamento entre as escalas é estimado pelo menor (agora - evento)
+    # observado: um evento nunca chega antes de acontecer, então o menor atraso
+    # visto é o mais próximo do deslocamento real
+    WRAP = 1 << 32
+
+    def __init__(self, clock=default_clock):
+        self.clock = clock
+        self.reset()
+
+    def reset(self):
+        # Nova estimativa a cada sessão, para que uma deriva lenta entre os
+        # relógios não se acumule
+        self.offset = None
+        self.last_raw = None
+        self.last_ms = 0
+
+    def to_clock(self, event_ms):
+        now = self.clock()
+        if self.last_raw is None:
+            self.last_ms = event_ms
+        else:
+            # Diferença com sinal em 32 bits: trata a volta a zero e eventos fora de ordem
+            delta = (event_ms - self.last_raw) % self.WRAP
+            if delta >= self.WRAP // 2:
+                delta -= self.WRAP
+            self.last_ms += delta
+        self.last_raw = event_ms
+
+        event_ns = self.last_ms * 1_000_000
+        if self.offset is None or now - event_ns < self.offset:
+            self.offset = now - event_ns
+        return event_ns + self.offset
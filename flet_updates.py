@@ -0,0 +1,164 @@
+import asyncio
+import json
+import threading
+
+from clock import NS_PER_SECOND, monotonic_clock
+
+# Atualizações agrupadas da página Flet.
+# Os handlers apenas marcam os controles que mudaram; uma vez por quadro o
+# agendador envia todos eles numa única chamada page.update(*controles), em
+# vez de cada clique e cada tick mandarem um diff da página inteira. Um
+# medidor conta as mensagens (e o tamanho estimado) enviadas ao cliente, para
+# comparar o tráfego do websocket em implantações no navegador.
+
+FRAME_SECONDS = 1 / 30
+
+
+class TrafficMeter:
+    # Mensagens e bytes enviados por segundo, medidos na conexão da página.
+    # O tamanho é estimado pelo JSON do conteúdo da mensagem (o formato real
+    # depende da versão do Flet: JSON nas 0.2x, msgpack nas 1.x)
+    def __init__(self, window_seconds=1.0, clock=monotonic_clock):
+        self.clock = clock
+        self.window_ns = int(window_seconds * NS_PER_SECOND)
+        self.messages = 0
+        self.bytes = 0
+        self.messages_per_second = 0.0
+        self.bytes_per_second = 0.0
+        self.installed = False
+        self._lock = threading.Lock()
+        self._window_start = clock()
+        self._window_messages = 0
+        self._window_bytes = 0
+
+    def install(self, page):
+        # Envolve o envio da conexão atual; retorna False se a versão do Flet
+        # não expõe a conexão (nesse caso só as atualizações agendadas são contadas)
+        session = getattr(page, "session", None)
+        connection = getattr(session, "connection", None) or getattr(page, "connection", None)
+        for name in ("send_message", "send_commands"):
+            send = getattr(connection, name, None)
+            if send is not None:
+                break
+        else:
+            return False
+
+        def counted_send(*args, **kwargs):
+            self.record(_estimate_size(args[-1]) if args else 0)
+            return send(*args, **kwargs)
+
+        setattr(connection, name, counted_send)
+        self.installed = True
+        return True
+
+    def record(self, size):
+        with self._lock:
+            self.messages += 1
+            self.bytes += size
+            self._window_messages += 1
+            self._window_bytes += size
+            self._roll(self.clock())
+
+    def rates(self):
+        with self._lock:
+            self._roll(self.clock())
+            return self.messages_per_second, self.bytes_per_second
+
+    def _roll(self, now):
+        elapsed = now - self._window_start
+        if elapsed < self.window_ns:
+            return
+        seconds = elapsed / NS_PER_SECOND
+        self.messages_per_second = self._window_messages / seconds
+        self.bytes_per_second = self._window_bytes / seconds
+        self._window_start = now
+        self._window_messages = 0
+        self._window_bytes = 0
+
+
+def _estimate_size(payload):
+    try:
+        return len(json.dumps(payload, default=_payload_fields).encode("utf-8"))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _payload_fields(value):
+    if hasattr(value, "__dict__"):
+        return vars(value)
+    return str(value)
+
+
+class UpdateScheduler:
+    # Os handlers do Flet rodam em threads do executor, então a marcação é
+    # protegida por trava e o laço é acordado com call_soon_threadsafe
+    def __init__(self, page, frame_seconds=FRAME_SECONDS, meter=None, profiler=None):
+        self.page = page
+        self.frame_seconds = frame_seconds
+        self.meter = meter
+        self.profiler = profiler  # SessionProfiler opcional: mede também o envio
+        self.flushes = 0
+        self.generation = 0  # Cada run() é uma geração; close() e um novo run() encerram as anteriores
+        self._dirty = {}  # id -> controle, na ordem em que foram marcados
+        self._lock = threading.Lock()
+        self._wake = asyncio.Event()
+        self._loop = None
+
+    def mark(self, *controls):
+        with self._lock:
+            for control in controls:
+                self._dirty[id(control)] = control
+        self._notify()
+
+    def close(self):
+        # Encerra o laço (página desconectada); as marcações pendentes ficam
+        # guardadas e são enviadas se o laço for iniciado de novo
+        self.generation += 1
+        self._notify()
+
+    def _notify(self):
+        if self._loop is None:
+            self._wake.set()  # Laço ainda não iniciado: o primeiro quadro envia tudo
+        else:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def mark_page(self):
+        # Propriedades da própria página (ex.: snack_bar) exigem page.update()
+        self.mark(self.page)
+
+    def flush(self):
+        # Envia numa única chamada todos os controles marcados; retorna quantos
+        with self._lock:
+            controls = list(self._dirty.values())
+            self._dirty.clear()
+        if not controls:
+            return 0
+        if any(control is self.page for control in controls):
+            self.page.update()
+        else:
+            self.page.update(*controls)
+        self.flushes += 1
+        if self.meter is not None and not self.meter.installed:
+            self.meter.record(0)
+        return len(controls)
+
+    async def run(self):
+        # Parado enquanto nada é marcado; depois de acordado espera o fim do
+        # quadro para juntar as marcações seguintes na mesma atualização
+        self._loop = asyncio.get_running_loop()
+        self.generation += 1
+        generation = self.generation
+        if self._dirty:
+            self._wake.set()  # Marcações guardadas de uma geração anterior
+        while True:
+            await self._wake.wait()
+            if generation != self.generation:
+                return  # Sem limpar o evento: ele pode ser da geração nova
+            self._wake.clear()
+            await asyncio.sleep(self.frame_seconds)
+            if generation != self.generation:
+                return
+            if self.profiler is None:
+                self.flush()
+            else:
+                self.profiler.runcall(self.flush)
@@ -0,0 +1,257 @@
+import os
+import re
+import struct
+import threading
+import time
+from collections import namedtuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from scoring import EngineListener
+
+# Diário binário da sessão (somente anexação).
+# Cada evento do motor vira um registro de 16 bytes; os registros ficam num
+# buffer em memória e uma thread de fundo grava e sincroniza (fsync) em lote,
+# então registrar um evento custa apenas um struct.pack no clique do botão.
+# Se o programa cair, a sessão em andamento é restaurada a partir do diário.
+# Enquanto aberto, o diário fica travado (trava exclusiva do sistema): outra
+# instância do programa não restaura como interrompida uma sessão em andamento.
+#
+# Registro: tipo (B), zona (B), tamanho do ID (H), argumento (I), instante (q)
+#   START: zona = número de zonas, argumento = duração (s),
+#          instante = relógio de parede (ns), seguido dos bytes do ID do animal
+#   ENTER/EXIT/TICK/STOP: instante = ns desde o início da sessão
+
+RECORD = struct.Struct("<BBHIq")
+
+START = 1
+ENTER = 2
+EXIT = 3
+TICK = 4
+STOP = 5
+
+JOURNAL_DIR = "sessoes"
+JOURNAL_EXT = ".ofj"
+FSYNC_INTERVAL = 1.0  # Segundos entre gravações em lote
+TICK_INTERVAL_NS = 1_000_000_000  # Um ponto de verificação por segundo basta
+LOCK_OFFSET = 0x7FFFFFFF  # Windows: byte travado, além do fim de qualquer diário
+
+JournalSession = namedtuple("JournalSession", [
+    "path", "animal_id", "duration", "n_zones", "wall_start_ns",
+    "events",     # Lista de (tipo, zona, ns desde o início)
+    "stopped",
+])
+
+
+def _lock(file):
+    # Trava exclusiva, sem espera; OSError se outro processo já a tem.
+    # No Windows a trava é obrigatória, então cobre um byte além do fim do
+    # arquivo para não impedir a leitura dos registros
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    else:
+        file.seek(LOCK_OFFSET)
+        msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+        file.seek(0, os.SEEK_END)
+
+
+def _in_use(path):
+    # Diário aberto por uma instância em execução
+    with open(path, "rb") as file:
+        try:
+            _lock(file)
+        except OSError:
+            return True
+        if fcntl is None:
+            file.seek(LOCK_OFFSET)
+            msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+    return False
+
+
+def journal_path(animal_id, directory=JOURNAL_DIR):
+    safe_id = re.sub(r"[^\w.-]", "_", animal_id)
+    timestamp = time.strftime("%Y%m%d_%H%M%S")
+    return os.path.join(directory, f"{safe_id}_{timestamp}{JOURNAL_EXT}")
+
+
+class SessionJournal(EngineListener):
+    def __init__(self, path, animal_id=""):
+        self.path = path
+        self.animal_id = animal_id
+        self.base = 0
+        self.last_tick = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, "ab")
+        try:
+            _lock(self.file)
+        except OSError:
+            self.file.close()
+            raise RuntimeError(f"{path}: diário aberto por outra instância do programa") from None
+
+        self._buffer = bytearray()
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._writer = threading.Thread(target=self._writer_loop, daemon=True)
+        self._writer.start()
+
+    def attach(self, engine):
+        # Continua um diário existente (sessão restaurada) sem novo START
+        self.base = engine.start_time
+        self.last_tick = engine.start_time
+
+    def on_start(self, engine):
+        self.base = engine.start_time
+        self.last_tick = engine.start_time
+        animal_id = self.animal_id.encode("utf-8")
+        self._append(RECORD.pack(START, engine.n_zones, len(animal_id), engine.duration, time.time_ns()) + animal_id)
+
+    def on_enter(self, zone, t):
+        self._append(RECORD.pack(ENTER, zone, 0, 0, t - self.base))
+
+    def on_exit(self, zone, t):
+        self._append(RECORD.pack(EXIT, zone, 0, 0, t - self.base))
+
+    def on_tick(self, t):
+        if t - self.last_tick >= TICK_INTERVAL_NS:
+            self.last_tick = t
+            self._append(RECORD.pack(TICK, 0, 0, 0, t - self.base))
+
+    def on_stop(self, t):
+        # A thread de fundo grava o STOP em seguida, sem fsync na thread que
+        # parou o teste; close() garante a gravação
+        self._append(RECORD.pack(STOP, 0, 0, 0, t - self.base))
+        self._wake.set()
+
+    def _append(self, data):
+        with self._lock:
+            self._buffer += data
+
+    def sync(self):
+        # Grava o buffer pendente e força a ida para o disco
+        with self._lock:
+            pending = self._buffer
+            self._buffer = bytearray()
+        with self._io_lock:
+            if pending and not self.file.closed:
+                self.file.write(pending)
+                self.file.flush()
+                os.fsync(self.file.fileno())
+
+    def _writer_loop(self):
+        while not self._closed:
+            self._wake.wait(FSYNC_INTERVAL)
+            self._wake.clear()
+            self.sync()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._writer.join()
+        self.sync()
+        self.file.close()
+
+
+def read_journal(path):
+    with open(path, "rb") as file:
+        data = file.read()
+
+    if len(data) < RECORD.size:
+        return None
+    kind, n_zones, id_length, duration, wall_start_ns = RECORD.unpack_from(data, 0)
+    if kind != START:
+        return None
+    offset = RECORD.size + id_length
+    animal_id = data[RECORD.size:offset].decode("utf-8", errors="replace")
+
+    events = []
+    stopped = False
+    # Um registro incompleto no final (queda durante a gravação) é descartado
+    end = offset + (len(data) - offset) // RECORD.size * RECORD.size
+    for kind, zone, _, _, t in RECORD.iter_unpack(data[offset:end]):
+        events.append((kind, zone, t))
+        if kind == STOP:
+            stopped = True
+    return JournalSession(path, animal_id, duration, n_zones, wall_start_ns, events, stopped)
+
+
+def pair_events(events):
+    # Converte os eventos em permanências (zona, entrada, saída) em ns relativos.
+    # Retorna as permanências e a que ficou aberta no fim do diário (zona,
+    # saída estimada) ou None. Uma permanência aberta (queda com botão
+    # pressionado) é encerrada no último instante registrado, a estimativa mais
+    # conservadora disponível; uma ENTER sem EXIT antes da ENTER seguinte, no
+    # último instante registrado antes dela
+    bouts = []
+    active_zone = None
+    enter = 0
+    last_t = 0
+    for kind, zone, t in events:
+        if kind == ENTER:
+            if active_zone is not None:
+                bouts.append((active_zone, enter, last_t))
+            active_zone = zone
+            enter = t
+        elif kind == EXIT and zone == active_zone:
+            bouts.append((zone, enter, t))
+            active_zone = None
+        last_t = max(last_t, t)
+    if active_zone is None:
+        return bouts, None
+    bouts.append((active_zone, enter, last_t))
+    return bouts, (active_zone, last_t)
+
+
+def find_unfinished(directory=JOURNAL_DIR):
+    # Diário mais recente cuja sessão não chegou a um STOP. Diários travados
+    # são de sessões em andamento em outra instância e ficam de fora
+    if not os.path.isdir(directory):
+        return None
+    paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(JOURNAL_EXT)]
+    paths = [path for path in paths if not _in_use(path)]
+    if not paths:
+        return None
+    session = read_journal(max(paths, key=os.path.getmtime))
+    if session is not None and not session.stopped:
+        return session
+    return None
+
+
+def recover_session(engine, directory=JOURNAL_DIR, wall_clock=time.time_ns):
+    # Restaura no motor a sessão interrompida mais recente, se houver.
+    # O teste continua correndo durante a queda, então o tempo decorrido é
+    # medido pelo relógio de parede desde o START. Retorna (sessão, diário)
+    session = find_unfinished(directory)
+    if session is None or session.n_zones != engine.n_zones:
+        return None, None
+
+    try:
+        journal = SessionJournal(session.path, session.animal_id)
+    except RuntimeError:
+        return None, None  # Outra instância restaurou a sessão primeiro
+
+    elapsed_ns = max(0, wall_clock() - session.wall_start_ns)
+    bouts, open_bout = pair_events(session.events)
+    engine.resume(session.duration, elapsed_ns, bouts)
+    journal.attach(engine)
+    if open_bout is not None:
+        # O encerramento da permanência aberta na queda vai para o diário,
+        # para que a reprodução e uma nova recuperação vejam o mesmo par ENTER/EXIT
+        zone, exit_t = open_bout
+        journal.on_exit(zone, engine.start_time + exit_t)
+    if not engine.running:
+        # A duração programada terminou enquanto o programa estava fechado
+        journal.on_stop(engine.stop_time)
+        journal.close()
+        return session, None
+    return session, journal
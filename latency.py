@@ -0,0 +1,64 @@
+import os
+
+from clock import default_clock
+from metrics import LogHistogram
+
+# Instrumentação da latência de entrada.
+# Para cada pressão e soltura tratada registra dois tempos em histogramas
+# logarítmicos (memória fixa, custo O(1) por evento):
+#   espera: do carimbo do evento do sistema até o início do handler. O carimbo
+#           é convertido pelo EventClock, cujo deslocamento é o menor atraso já
+#           visto, então a espera é o excedente sobre o melhor caso (limite inferior)
+#   handler: tempo gasto dentro do handler
+# Onde o evento não traz carimbo (Flet), apenas o tempo do handler é registrado.
+
+PRESS = "press"
+RELEASE = "release"
+KIND_NAMES = {PRESS: "Pressão", RELEASE: "Soltura"}
+
+
+class InputLatency:
+    def __init__(self, clock=default_clock):
+        self.clock = clock
+        self.delay = {kind: LogHistogram() for kind in KIND_NAMES}
+        self.handler = {kind: LogHistogram() for kind in KIND_NAMES}
+
+    def begin(self, kind, event_t=None, received=None):
+        # Início do handler; `received` é o instante de chegada quando o
+        # tratamento é adiado de propósito (ex.: soltura de tecla)
+        now = self.clock()
+        if event_t is not None:
+            self.delay[kind].record((now if received is None else received) - event_t)
+        return now
+
+    def end(self, kind, start):
+        self.handler[kind].record(self.clock() - start)
+
+    def clear(self):
+        for histogram in (*self.delay.values(), *self.handler.values()):
+            histogram.clear()
+
+    def dump(self, path):
+        # Distribuição completa de cada histograma, no estilo do HdrHistogram:
+        # valor (limite superior da faixa), percentil e contagem acumulada
+        with open(path, "w", encoding="utf-8") as file:
+            for label, histograms in (("espera evento->handler", self.delay), ("tempo no handler", self.handler)):
+                for kind, histogram in histograms.items():
+                    file.write(f"# {KIND_NAMES[kind]}: {label} (ms), {histogram.count} eventos\n")
+                    if not histogram.count:
+                        file.write("\n")
+                        continue
+                    file.write(f"# mín {histogram.min / 1e6:.3f}  média {histogram.mean() / 1e6:.3f}  "
+                               f"máx {histogram.max / 1e6:.3f}\n")
+                    file.write(f"{'Valor':>12} {'Percentil':>12} {'Contagem':>10}\n")
+                    seen = 0
+                    for _, high, count in histogram.buckets():
+                        seen += count
+                        file.write(f"{min(high, histogram.max) / 1e6:>12.3f} "
+                                   f"{seen / histogram.count:>12.6f} {seen:>10}\n")
+                    file.write("\n")
+
+
+def latency_path(report_path):
+    # Arquivo dos histogramas ao lado do relatório exportado
+    return os.path.splitext(report_path)[0] + "_latencia.txt"
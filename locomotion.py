@@ -0,0 +1,110 @@
+from collections import namedtuple
+
+import numpy as np
+
+# Métricas de locomoção a partir da trajetória rastreada: distância
+# percorrida, velocidade média e tempo imóvel, no total, por zona e por
+# intervalo de tempo. Tudo é calculado com operações de array sobre a
+# trajetória inteira (custo desprezível perto do rastreamento).
+# O deslocamento entre os quadros i e i+1 pertence à zona e ao intervalo do
+# quadro i, como o tempo do quadro na contabilidade das áreas.
+
+ARENA_SIDE_CM = 40.0   # Lado padrão da arena (campo aberto para camundongos)
+IMMOBILE_SPEED = 2.0   # cm/s: abaixo disso o animal é considerado imóvel
+IMMOBILE_SECONDS = 1.0 # Imobilidade só conta em trechos de pelo menos esta duração
+SMOOTH_SECONDS = 0.2   # Janela da média móvel da velocidade (ruído do centróide)
+
+Locomotion = namedtuple("Locomotion", [
+    "distance",        # cm
+    "mean_speed",      # cm/s
+    "immobile",        # s
+    "duration",        # s analisados
+    "zone_distance",   # Arrays indexados pelo id da zona
+    "zone_speed",
+    "zone_immobile",
+    "bin_seconds",
+    "bin_distance",    # Arrays indexados pelo intervalo
+    "bin_immobile",
+])
+
+
+def fill_positions(positions):
+    # Quadros sem detecção repetem a última posição conhecida (sem deslocamento)
+    found = ~np.isnan(positions[:, 0])
+    last_found = np.maximum.accumulate(np.where(found, np.arange(len(positions)), -1))
+    filled = positions[np.maximum(last_found, 0)]
+    filled[last_found < 0] = filled[np.argmax(found)] if found.any() else 0
+    return filled
+
+
+def runs_at_least(mask, min_length):
+    # Mantém apenas os trechos contínuos de True com pelo menos `min_length` itens
+    edges = np.diff(mask.astype(np.int8), prepend=0, append=0)
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    keep = ends - starts >= min_length
+    result = np.zeros(len(mask) + 1, dtype=np.int32)
+    np.add.at(result, starts[keep], 1)
+    np.add.at(result, ends[keep], -1)
+    return np.cumsum(result[:-1]) > 0
+
+
+def _per_index(index, weights, minlength):
+    # Soma por índice; índice -1 (sem zona) é descartado
+    return np.bincount(index + 1, weights=weights, minlength=minlength + 1)[1:]
+
+
+def locomotion(positions, frame_zones, fps, cm_per_pixel, n_zones, bin_seconds=60,
+               immobile_speed=IMMOBILE_SPEED, immobile_seconds=IMMOBILE_SECONDS):
+    positions = fill_positions(positions)
+    n = len(positions)
+    frame_zones = np.asarray(frame_zones, dtype=np.intp)
+    duration = n / fps
+
+    # Deslocamento de cada quadro até o seguinte (o último quadro não se desloca)
+    steps = np.zeros(n)
+    if n > 1:
+        steps[:-1] = np.hypot(np.diff(positions[:, 0]), np.diff(positions[:, 1])) * cm_per_pixel
+
+    # Velocidade suavizada por média móvel, para o ruído do centróide não
+    # tirar o animal parado da imobilidade
+    window = max(1, int(round(SMOOTH_SECONDS * fps)))
+    speed = np.convolve(steps * fps, np.ones(window) / window, mode="same")
+    immobile = runs_at_least(speed < immobile_speed, int(round(immobile_seconds * fps)))
+
+    zone_frames = _per_index(frame_zones, None, n_zones)
+    zone_distance = _per_index(frame_zones, steps, n_zones)
+    zone_immobile = _per_index(frame_zones, immobile.astype(np.float64), n_zones) / fps
+    with np.errstate(divide="ignore", invalid="ignore"):
+        zone_speed = np.where(zone_frames > 0, zone_distance * fps / zone_frames, 0.0)
+
+    bins = np.arange(n) // int(round(bin_seconds * fps))
+    n_bins = int(bins[-1]) + 1 if n else 0
+    return Locomotion(
+        distance=float(steps.sum()),
+        mean_speed=float(steps.sum() / duration) if duration else 0.0,
+        immobile=float(np.count_nonzero(immobile) / fps),
+        duration=duration,
+        zone_distance=zone_distance,
+        zone_speed=zone_speed,
+        zone_immobile=zone_immobile,
+        bin_seconds=bin_seconds,
+        bin_distance=np.bincount(bins, weights=steps, minlength=n_bins),
+        bin_immobile=np.bincount(bins, weights=immobile, minlength=n_bins) / fps,
+    )
+
+
+def locomotion_test_data(zones, result):
+    test_data = {
+        "Distância Percorrida (cm)": result.distance,
+        "Velocidade Média (cm/s)": result.mean_speed,
+        "Tempo Imóvel (s)": result.immobile,
+    }
+    for zone_id, zone in enumerate(zones):
+        suffix = f"{zone.article} {zone.name}"
+        test_data[f"Distância {suffix} (cm)"] = float(result.zone_distance[zone_id])
+        test_data[f"Velocidade Média {suffix} (cm/s)"] = float(result.zone_speed[zone_id])
+        test_data[f"Tempo Imóvel {suffix} (s)"] = float(result.zone_immobile[zone_id])
+    test_data["Distância por Intervalo (cm)"] = result.bin_distance.tolist()
+    test_data["Tempo Imóvel por Intervalo (s)"] = result.bin_immobile.tolist()
+    return test_data
@@ -0,0 +1,223 @@
+import math
+from array import array
+
+from clock import NS_PER_SECOND, to_seconds
+from scoring import EngineListener
+
+# Métricas calculadas incrementalmente durante o teste, como ouvintes do
+# motor de pontuação: cada transição de área e cada tick custam O(1), então
+# os resultados estão prontos assim que o teste termina.
+
+
+class OccupancyBins(EngineListener):
+    # Tempo em cada zona por intervalo de tempo (ex.: por minuto)
+    def __init__(self, n_zones, bin_seconds=60):
+        self.n_zones = n_zones
+        self.bin_ns = bin_seconds * NS_PER_SECOND
+        self.bins = []
+        self.start = 0
+        self.end = 0
+        self.active_zone = None
+        self.last = 0
+
+    @property
+    def bin_seconds(self):
+        return self.bin_ns // NS_PER_SECOND
+
+    def on_start(self, engine):
+        self.bins = []
+        self.start = engine.start_time
+        self.end = engine.start_time + engine.duration_ns
+        self.active_zone = None
+
+    def on_resume(self, engine):
+        self.on_start(engine)
+        for zone, enter, exit in engine.bouts:
+            self.active_zone = zone
+            self.last = enter
+            self._credit(exit)
+        self.active_zone = None
+
+    def on_enter(self, zone, t):
+        self.active_zone = zone
+        self.last = t
+
+    def on_exit(self, zone, t):
+        self._credit(t)
+        self.active_zone = None
+
+    def on_tick(self, t):
+        self._credit(t)
+
+    def on_stop(self, t):
+        self._credit(t)
+
+    def _credit(self, t):
+        # Credita à zona ativa o tempo desde o último crédito. Como os ticks são
+        # bem mais curtos que um intervalo, cada chamada toca no máximo dois intervalos
+        if self.active_zone is None:
+            return
+        t = min(t, self.end)
+        if t < self.last:
+            # Transição com carimbo do evento anterior ao último tick: desfaz o excedente
+            self._add(t, self.last, -1)
+        else:
+            self._add(self.last, t, 1)
+        self.last = t
+
+    def _add(self, begin, end, sign):
+        pos = begin - self.start
+        end -= self.start
+        while pos < end:
+            index = pos // self.bin_ns
+            upto = min(end, (index + 1) * self.bin_ns)
+            while len(self.bins) <= index:
+                self.bins.append(array("q", bytes(8 * self.n_zones)))
+            self.bins[index][self.active_zone] += sign * (upto - pos)
+            pos = upto
+
+    def table_ns(self, effective_duration_ns, now=None):
+        # Tabela [intervalo][zona] em ns cobrindo toda a duração efetiva
+        if now is not None:
+            self._credit(now)
+        n_bins = max(1, -(-effective_duration_ns // self.bin_ns))
+        table = [list(row) for row in self.bins[:n_bins]]
+        table.extend([0] * self.n_zones for _ in range(n_bins - len(table)))
+        return table
+
+
+class LogHistogram:
+    # Histograma logarítmico no estilo HDR: memória limitada (no máximo
+    # 64 * 2**(precision_bits - 1) contadores) e erro relativo de
+    # ~2**-precision_bits nos quantis; mínimo, máximo e soma são exatos
+    def __init__(self, precision_bits=7):
+        self.precision_bits = precision_bits
+        self.half = 1 << (precision_bits - 1)
+        self.counts = array("q")
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        self._quantiles = {}
+
+    def _index(self, value):
+        if value < (self.half << 1):
+            return value
+        shift = value.bit_length() - self.precision_bits
+        return shift * self.half + (value >> shift)
+
+    def _bounds(self, index):
+        if index < (self.half << 1):
+            return index, index
+        shift = index // self.half - 1
+        mantissa = index - shift * self.half
+        return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+    def record(self, value):
+        value = max(0, value)
+        index = self._index(value)
+        if index >= len(self.counts):
+            self.counts.extend([0] * (index + 1 - len(self.counts)))
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, q):
+        # Percorre os contadores apenas quando houve novos registros desde a última consulta
+        if not self.count:
+            return 0
+        cached = self._quantiles.get(q)
+        if cached is not None and cached[0] == self.count:
+            return cached[1]
+        value = self._quantile(q)
+        self._quantiles[q] = (self.count, value)
+        return value
+
+    def _quantile(self, q):
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                low, high = self._bounds(index)
+                return min(max((low + high) // 2, self.min), self.max)
+        return self.max
+
+    def buckets(self):
+        # Faixas não vazias (mínimo, máximo, contagem), em ordem crescente
+        for index, count in enumerate(self.counts):
+            if count:
+                low, high = self._bounds(index)
+                yield low, high, count
+
+    def clear(self):
+        del self.counts[:]
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        self._quantiles = {}
+
+
+class BoutStats(EngineListener):
+    # Entradas, latência até a primeira entrada e estatísticas das
+    # permanências (média, mediana, máxima) por zona, atualizadas a cada
+    # entrada/saída. A mediana vem de um histograma de memória limitada,
+    # então sessões de 24 h não fazem a memória crescer
+    def __init__(self, n_zones):
+        self.n_zones = n_zones
+        self.start = 0
+        self.entries = [0] * n_zones
+        self.first_entry = [None] * n_zones
+        self.durations = [LogHistogram() for _ in range(n_zones)]
+        self.enter_time = None
+
+    def on_start(self, engine):
+        self.start = engine.start_time
+        self.entries = [0] * self.n_zones
+        self.first_entry = [None] * self.n_zones
+        for histogram in self.durations:
+            histogram.clear()
+
+    def on_resume(self, engine):
+        self.on_start(engine)
+        for zone, enter, exit in engine.bouts:
+            self.on_enter(zone, enter)
+            self.on_exit(zone, exit)
+        self.enter_time = None
+
+    def on_enter(self, zone, t):
+        self.entries[zone] += 1
+        if self.first_entry[zone] is None:
+            self.first_entry[zone] = t - self.start
+        self.enter_time = t
+
+    def on_exit(self, zone, t):
+        self.durations[zone].record(t - self.enter_time)
+
+    def latency_ns(self, zones, category):
+        # Latência até a primeira entrada em qualquer zona da categoria (ex.: centro)
+        latencies = [self.first_entry[zone_id] for zone_id, zone in enumerate(zones)
+                     if zone.category == category and self.first_entry[zone_id] is not None]
+        return min(latencies) if latencies else None
+
+
+def bout_test_data(zones, stats):
+    test_data = {}
+    for zone_id, zone in enumerate(zones):
+        durations = stats.durations[zone_id]
+        first_entry = stats.first_entry[zone_id]
+        suffix = f"{zone.article} {zone.name}"
+        test_data[f"Entradas {suffix}"] = stats.entries[zone_id]
+        test_data[f"Latência {suffix} (s)"] = to_seconds(first_entry) if first_entry is not None else None
+        test_data[f"Permanência Média {suffix} (s)"] = to_seconds(durations.mean())
+        test_data[f"Permanência Mediana {suffix} (s)"] = to_seconds(durations.quantile(0.5))
+        test_data[f"Permanência Máxima {suffix} (s)"] = to_seconds(durations.max or 0)
+    return test_data
@@ -1,12 +1,31 @@
+import argparse
 import tkinter as tk
 from tkinter import messagebox, filedialog
-import time
 import os
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+
+from charts import TkPieChart
+from clock import NS_PER_SECOND, EventClock, default_clock, to_seconds
+from journal import SessionJournal, journal_path, recover_session
+from latency import PRESS, RELEASE, InputLatency, latency_path
+from metrics import BoutStats, OccupancyBins
+from profiling import SessionProfiler, profile_base
+from report import ReportModel, TkTextSink, build_report
+from scoring import ScoringEngine
+from zones import ARENAS, DEFAULT_ZONES, zone_label
+
+# Teclas de marcação: 1-9 na fileira de números e no teclado numérico (com o
+# Num Lock desligado o teclado numérico envia as teclas de navegação)
+NUMPAD_NAV_KEYS = ("KP_End", "KP_Down", "KP_Next", "KP_Left", "KP_Begin", "KP_Right", "KP_Home", "KP_Up", "KP_Prior")
+ZONE_KEYS = {key: index for index, nav_key in enumerate(NUMPAD_NAV_KEYS)
+             for key in (str(index + 1), f"KP_{index + 1}", nav_key)}
+
+# No X11 a repetição automática gera pares soltura/pressão enquanto a tecla
+# está segura; uma soltura só vale se nenhuma pressão da mesma tecla vier logo depois
+AUTOREPEAT_MS = 30
+
 
 class OpenFieldApp:
-    def __init__(self, master):
+    def __init__(self, master, zones=DEFAULT_ZONES, clock=default_clock):
         self.master = master
         master.title("Teste de Campo Aberto - Marcação de Áreas")
         master.geometry("1400x700") # Aumenta a largura da janela para duas colunas
@@ -16,30 +35,44 @@ class OpenFieldApp:
         master.grid_columnconfigure(1, weight=1) # Coluna da direita
         master.grid_rowconfigure(0, weight=1) # Apenas uma linha principal
 
-        self.test_running = False
-        self.start_time = None
-        self.remaining_time = 0
         self.animal_id = tk.StringVar()
         self.test_duration = tk.IntVar(value=300)
+        self.bin_seconds = tk.IntVar(value=60)
+        self.profile_session = tk.BooleanVar(value=False)
+
+        # Tabela de áreas da arena (padrão: Canto, Lateral, Centro)
+        self.zones = zones
+
+        # Toda a contabilidade de tempo das áreas fica no motor de pontuação
+        # (o relógio é injetável para simular sessões com um relógio falso)
+        self.engine = ScoringEngine(n_zones=len(zones), clock=clock)
+        self.journal = None
 
-        # Variáveis para armazenar o tempo acumulado em cada área
-        self.corner_time = 0.0
-        self.lateral_time = 0.0
-        self.center_time = 0.0
+        # Transições marcadas no instante do evento (event.time), não no de
+        # execução do handler, para que a fila do Tk não vire erro de medida
+        self.event_clock = EventClock(clock)
+        self.pending_key_release = None # (zona, id do after, evento, instante de chegada)
 
-        # Variáveis para controlar se um botão de área está atualmente pressionado
-        self.corner_button_pressed = False
-        self.lateral_button_pressed = False
-        self.center_button_pressed = False
+        # Histogramas da espera evento->handler e do tempo nos handlers de marcação
+        self.input_latency = InputLatency(clock)
 
-        # Variáveis para registrar o tempo de início da pressão do botão
-        self.corner_press_time = None
-        self.lateral_press_time = None
-        self.center_press_time = None
+        # Perfil opcional da sessão (cProfile + tracemalloc) entre start_test e stop_test
+        self.profiler = SessionProfiler()
+
+        # Ocupação por intervalo de tempo, acumulada durante o teste
+        self.occupancy = OccupancyBins(len(zones))
+        self.engine.listeners.append(self.occupancy)
+
+        # Entradas, latências e estatísticas das permanências, atualizadas a cada transição
+        self.bout_stats = BoutStats(len(zones))
+        self.engine.listeners.append(self.bout_stats)
 
         self.test_data = {} # Para armazenar os resultados do teste atual para o relatório
+        self.chart = None # Gráfico de pizza persistente, criado no primeiro uso
+        self.chart_key = None # Tempos por área exibidos no gráfico atual
 
         self._create_widgets()
+        master.after_idle(self._recover_session)
 
     def _create_widgets(self):
         # --- COLUNA DA ESQUERDA: Aplicação de Teste ---
@@ -61,6 +94,11 @@ class OpenFieldApp:
         tk.Label(config_frame, text="Duração do Teste (segundos):").grid(row=1, column=0, padx=5, pady=5, sticky="w")
         tk.Entry(config_frame, textvariable=self.test_duration, width=30).grid(row=1, column=1, padx=5, pady=5, sticky="ew")
 
+        tk.Label(config_frame, text="Intervalo de Análise (segundos):").grid(row=2, column=0, padx=5, pady=5, sticky="w")
+        tk.Entry(config_frame, textvariable=self.bin_seconds, width=30).grid(row=2, column=1, padx=5, pady=5, sticky="ew")
+
+        tk.Checkbutton(config_frame, text="Medir desempenho desta sessão (perfil)", variable=self.profile_session).grid(row=3, column=0, columnspan=2, padx=5, pady=5, sticky="w")
+
         # Frame de Controle do Teste
         control_frame = tk.LabelFrame(self.left_column_frame, text="Controle do Teste", padx=10, pady=10)
         control_frame.grid(row=1, column=0, pady=10, padx=10, sticky="ew") # Usa grid
@@ -78,36 +116,41 @@ class OpenFieldApp:
         self.stop_button.pack(side="left", padx=10)
 
         # Frame de Marcação de Áreas
-        area_frame = tk.LabelFrame(self.left_column_frame, text="Marcação de Áreas (Pressione e Segure)", padx=10, pady=10)
+        area_frame = tk.LabelFrame(self.left_column_frame, text="Marcação de Áreas (Pressione e Segure o botão ou as teclas 1-9)", padx=10, pady=10)
         area_frame.grid(row=2, column=0, pady=10, padx=10, sticky="nsew") # Usa grid e expande
-        area_frame.grid_columnconfigure(0, weight=1)
-        area_frame.grid_columnconfigure(1, weight=1)
-        area_frame.grid_rowconfigure((0,1,2,3,4), weight=0) # Linhas de botões não se expandem
-        area_frame.grid_rowconfigure(5, weight=1) # Linha extra para empurrar conteúdo para cima, se necessário
-
-        # Botões das áreas
-        self.corner_btn = tk.Button(area_frame, text="Canto", bg="red", fg="white", width=15, height=3, state="disabled")
-        self.corner_btn.bind("<ButtonPress-1>", self._on_button_press)
-        self.corner_btn.bind("<ButtonRelease-1>", self._on_button_release)
-        self.corner_btn.grid(row=0, column=0, padx=5, pady=5, sticky="ew")
-
-        self.lateral_btn = tk.Button(area_frame, text="Lateral", bg="skyblue", width=15, height=3, state="disabled")
-        self.lateral_btn.bind("<ButtonPress-1>", self._on_button_press)
-        self.lateral_btn.bind("<ButtonRelease-1>", self._on_button_release)
-        self.lateral_btn.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
-
-        self.center_btn = tk.Button(area_frame, text="Centro", bg="forestgreen", fg="white", width=15, height=3, state="disabled")
-        self.center_btn.bind("<ButtonPress-1>", self._on_button_press)
-        self.center_btn.bind("<ButtonRelease-1>", self._on_button_release)
-        self.center_btn.grid(row=1, column=0, columnspan=2, padx=5, pady=5, sticky="ew")
+        # Botões das áreas, gerados a partir da tabela de zonas da arena
+        n_cols = max(zone.col + zone.colspan for zone in self.zones)
+        n_rows = max(zone.row for zone in self.zones) + 1
+        label_cols = 1 if len(self.zones) <= 3 else n_cols # Poucas áreas: um rótulo por linha
+        button_width, button_height = (15, 3) if n_cols <= 2 else (6, 2)
+        for col in range(n_cols):
+            area_frame.grid_columnconfigure(col, weight=1)
+
+        # Widgets e cores indexados pelo id da zona no motor de pontuação
+        self.area_buttons = []
+        self.area_time_labels = []
+        for zone_id, zone in enumerate(self.zones):
+            button = tk.Button(area_frame, text=zone.name, bg=zone.color, fg=zone.fg,
+                               width=button_width, height=button_height, state="disabled")
+            button.bind("<ButtonPress-1>", lambda event, z=zone_id: self._on_button_press(event, z))
+            button.bind("<ButtonRelease-1>", lambda event, z=zone_id: self._on_button_release(event, z))
+            button.grid(row=zone.row, column=zone.col, columnspan=zone.colspan, padx=5, pady=5, sticky="ew")
+            self.area_buttons.append(button)
 
         # Labels para exibir os tempos acumulados em tempo real
-        self.corner_time_label = tk.Label(area_frame, text="Tempo no Canto: 0.00 s")
-        self.corner_time_label.grid(row=2, column=0, columnspan=2, sticky="w", padx=5, pady=2)
-        self.lateral_time_label = tk.Label(area_frame, text="Tempo na Lateral: 0.00 s")
-        self.lateral_time_label.grid(row=3, column=0, columnspan=2, sticky="w", padx=5, pady=2)
-        self.center_time_label = tk.Label(area_frame, text="Tempo no Centro: 0.00 s")
-        self.center_time_label.grid(row=4, column=0, columnspan=2, sticky="w", padx=5, pady=2)
+        for zone_id, zone in enumerate(self.zones):
+            label = tk.Label(area_frame, text=f"{zone_label(zone)}: 0.00 s")
+            label.grid(row=n_rows + zone_id // label_cols, column=zone_id % label_cols,
+                       columnspan=n_cols if label_cols == 1 else 1, sticky="w", padx=5, pady=2)
+            self.area_time_labels.append(label)
+
+        label_rows = n_rows + (len(self.zones) + label_cols - 1) // label_cols
+        area_frame.grid_rowconfigure(tuple(range(label_rows)), weight=0) # Linhas de botões não se expandem
+        area_frame.grid_rowconfigure(label_rows, weight=1) # Linha extra para empurrar conteúdo para cima, se necessário
+
+        # Teclas de marcação valem na janela inteira
+        self.master.bind("<KeyPress>", self._on_key_press)
+        self.master.bind("<KeyRelease>", self._on_key_release)
 
 
         # --- COLUNA DA DIREITA: Relatório e Gráfico ---
@@ -118,14 +161,17 @@ class OpenFieldApp:
         self.right_column_frame.grid_rowconfigure(2, weight=2) # Gráfico (expande mais)
         self.right_column_frame.grid_columnconfigure(0, weight=1) # Uma coluna que se expande
 
-        # Frame de Relatórios
-        report_frame = tk.LabelFrame(self.right_column_frame, text="Relatório do Teste", padx=10, pady=10)
-        report_frame.grid(row=0, column=0, pady=10, padx=10, sticky="nsew")
-        report_frame.grid_rowconfigure(0, weight=1) # Faz o Text widget expandir
-        report_frame.grid_columnconfigure(0, weight=1)
+        # Frame de Relatórios (o widget de texto só é criado no primeiro relatório)
+        self.report_frame = tk.LabelFrame(self.right_column_frame, text="Relatório do Teste", padx=10, pady=10)
+        self.report_frame.grid(row=0, column=0, pady=10, padx=10, sticky="nsew")
+        self.report_frame.grid_rowconfigure(0, weight=1) # Faz o Text widget expandir
+        self.report_frame.grid_columnconfigure(0, weight=1)
 
-        self.report_text = tk.Text(report_frame, height=8, state="disabled", wrap="word")
-        self.report_text.grid(row=0, column=0, pady=5, padx=5, sticky="nsew")
+        self.report_placeholder = tk.Label(self.report_frame, text="Nenhum relatório gerado ainda.", fg="gray")
+        self.report_placeholder.grid(row=0, column=0, pady=5, padx=5)
+        self.report_text = None
+        self.report = ReportModel()
+        self.report_sink = None
 
         # Botões de relatório e exportação
         report_buttons_frame = tk.Frame(self.right_column_frame)
@@ -141,7 +187,7 @@ class OpenFieldApp:
 
 
     def start_test(self):
-        if self.test_running:
+        if self.engine.running:
             return
 
         animal_id = self.animal_id.get().strip()
@@ -153,298 +199,257 @@ class OpenFieldApp:
             duration = self.test_duration.get()
             if duration <= 0:
                 raise ValueError
-        except ValueError:
+        except (ValueError, tk.TclError):
             messagebox.showwarning("Erro", "Por favor, insira uma duração de teste válida (número inteiro positivo).")
             return
 
-        self.test_running = True
-        self.start_time = time.time()
-        self.remaining_time = duration
-
-        # Resetar todos os tempos e estados dos botões
-        self.corner_time = 0.0
-        self.lateral_time = 0.0
-        self.center_time = 0.0
-        self.corner_button_pressed = False
-        self.lateral_button_pressed = False
-        self.center_button_pressed = False
-        self.corner_press_time = None
-        self.lateral_press_time = None
-        self.center_press_time = None
+        try:
+            bin_seconds = self.bin_seconds.get()
+            if bin_seconds <= 0:
+                raise ValueError
+        except (ValueError, tk.TclError):
+            messagebox.showwarning("Erro", "Por favor, insira um intervalo de análise válido (número inteiro positivo).")
+            return
+        self.occupancy.bin_ns = bin_seconds * NS_PER_SECOND
+
+        # Cada evento da sessão é anexado ao diário para recuperação após quedas
+        self._close_journal()
+        try:
+            self.journal = SessionJournal(journal_path(animal_id), animal_id)
+        except RuntimeError as e:
+            messagebox.showwarning("Erro", str(e))
+            return
+        self.engine.listeners.append(self.journal)
+
+        # O gráfico (e o Matplotlib) é preparado antes de o relógio do teste começar
+        self._ensure_chart()
+
+        if self.profile_session.get():
+            try:
+                self.profiler.start()
+            except ValueError as e:
+                messagebox.showwarning("Perfil", f"Não foi possível medir o desempenho: {e}")
+
+        # Reinicia o motor (tempos, área ativa e registro de permanências)
+        self.engine.start(duration)
+        self._begin_session_ui()
+
+    def _begin_session_ui(self):
         self.test_data = {}
+        self.event_clock.reset()
+        self.input_latency.clear()
+        self.master.focus_set() # Tira o foco dos campos de texto para as teclas de marcação
 
         self._update_area_time_labels()
 
         self.start_button.config(state="disabled")
         self.stop_button.config(state="normal")
-        self.corner_btn.config(state="normal")
-        self.lateral_btn.config(state="normal")
-        self.center_btn.config(state="normal")
+        for button in self.area_buttons:
+            button.config(state="normal", relief="raised")
 
-        # Limpa o gráfico anterior, se houver
-        for widget in self.chart_frame.winfo_children():
-            widget.destroy()
+        # Zera o gráfico, que passa a acompanhar o teste ao vivo
+        self._refresh_chart([0] * len(self.zones))
 
         self.update_timer()
 
     def stop_test(self, manual_stop=True):
-        if not self.test_running:
+        if not self.engine.running:
             return
 
-        self.test_running = False
+        # Garante que qualquer tempo ativo seja contabilizado ao parar o teste
+        active_zone = self.engine.active_zone
+        self.engine.stop()
+        self._close_journal()
+        if active_zone is not None:
+            self._highlight_button(active_zone, False)
+
         self.start_button.config(state="normal")
         self.stop_button.config(state="disabled")
-        self.corner_btn.config(state="disabled")
-        self.lateral_btn.config(state="disabled")
-        self.center_btn.config(state="disabled")
-
-        # Garante que qualquer tempo ativo seja contabilizado ao parar o teste
-        if self.corner_button_pressed:
-            self._on_button_release(event=None, button_name="Canto")
-        if self.lateral_button_pressed:
-            self._on_button_release(event=None, button_name="Lateral")
-        if self.center_button_pressed:
-            self._on_button_release(event=None, button_name="Centro")
+        for button in self.area_buttons:
+            button.config(state="disabled")
 
         self._update_area_time_labels()
         self.generate_report() # Gera o relatório e o gráfico final
+        profile_paths = self._write_profile()
 
         if manual_stop:
             messagebox.showinfo("Teste Finalizado", f"Teste para {self.animal_id.get()} finalizado!")
+        if profile_paths:
+            messagebox.showinfo("Perfil da Sessão", "Perfil de desempenho gravado em:\n" + "\n".join(profile_paths))
+
+    def _write_profile(self):
+        # Encerra o perfil da sessão (se ativo) e grava as estatísticas com o
+        # mesmo nome-base dos relatórios exportados
+        if not self.profiler.active:
+            return []
+        self.profiler.stop()
+        try:
+            return self.profiler.write(profile_base(self.animal_id.get()))
+        except Exception as e:
+            messagebox.showerror("Erro no Perfil", f"Ocorreu um erro ao gravar o perfil da sessão: {e}")
+            return []
+
+    def _close_journal(self):
+        if self.journal is not None:
+            self.engine.listeners.remove(self.journal)
+            self.journal.close()
+            self.journal = None
+
+    def _recover_session(self):
+        # Restaura a sessão interrompida por uma queda do programa, se houver
+        session, journal = recover_session(self.engine)
+        if session is None:
+            return
+
+        self.animal_id.set(session.animal_id)
+        self.test_duration.set(session.duration)
+        if journal is None:
+            self._update_area_time_labels()
+            self.generate_report()
+            messagebox.showinfo("Sessão Recuperada", f"O teste de {session.animal_id} terminou enquanto o programa estava fechado. Relatório restaurado do diário.")
+            return
+
+        self.journal = journal
+        self.engine.listeners.append(journal)
+        self._begin_session_ui()
+        messagebox.showinfo("Sessão Recuperada", f"Teste de {session.animal_id} restaurado do diário e em andamento.")
 
     def update_timer(self):
-        if self.test_running:
-            elapsed_total_time = time.time() - self.start_time
-            self.remaining_time = self.test_duration.get() - elapsed_total_time
-
-            # Atualizar os tempos das áreas em tempo real (mesmo que o botão esteja pressionado)
-            if self.corner_button_pressed and self.corner_press_time:
-                current_press_duration = time.time() - self.corner_press_time
-                self.corner_time_label.config(text=f"Tempo no Canto: {self.corner_time + current_press_duration:.2f} s")
-            if self.lateral_button_pressed and self.lateral_press_time:
-                current_press_duration = time.time() - self.lateral_press_time
-                self.lateral_time_label.config(text=f"Tempo na Lateral: {self.lateral_time + current_press_duration:.2f} s")
-            if self.center_button_pressed and self.center_press_time:
-                current_press_duration = time.time() - self.center_press_time
-                self.center_time_label.config(text=f"Tempo no Centro: {self.center_time + current_press_duration:.2f} s")
-
-
-            if self.remaining_time <= 0:
-                self.remaining_time = 0
+        if self.engine.running:
+            remaining_ns = self.engine.tick()
+
+            # Atualizar em tempo real apenas o tempo da área ativa (as demais não mudam)
+            # e o gráfico de pizza ao vivo
+            if self.engine.active_zone is not None:
+                self._update_area_time_label(self.engine.active_zone)
+                self._refresh_chart([self.engine.zone_time_ns(zone) for zone in range(len(self.zones))])
+
+            if remaining_ns <= 0:
                 self.timer_label.config(text="Tempo Restante: 00:00")
                 self.stop_test(manual_stop=False)
                 return
 
-            mins = int(self.remaining_time // 60)
-            secs = int(self.remaining_time % 60)
+            mins, secs = divmod(remaining_ns // NS_PER_SECOND, 60)
             self.timer_label.config(text=f"Tempo Restante: {mins:02d}:{secs:02d}")
             self.master.after(200, self.update_timer)
 
-    def _on_button_press(self, event):
-        if self.test_running:
-            # Garante que, se um botão diferente estiver ativo, seu tempo seja parado e contabilizado
-            if self.corner_button_pressed and event.widget != self.corner_btn:
-                self._on_button_release(event=None, button_name="Canto")
-            if self.lateral_button_pressed and event.widget != self.lateral_btn:
-                self._on_button_release(event=None, button_name="Lateral")
-            if self.center_button_pressed and event.widget != self.center_btn:
-                self._on_button_release(event=None, button_name="Centro")
-
-            # Agora, inicia o tempo para o botão que foi pressionado
-            if event.widget == self.corner_btn and not self.corner_button_pressed:
-                self.corner_button_pressed = True
-                self.corner_press_time = time.time()
-                self._highlight_button(self.corner_btn, True)
-            elif event.widget == self.lateral_btn and not self.lateral_button_pressed:
-                self.lateral_button_pressed = True
-                self.lateral_press_time = time.time()
-                self._highlight_button(self.lateral_btn, True)
-            elif event.widget == self.center_btn and not self.center_button_pressed:
-                self.center_button_pressed = True
-                self.center_press_time = time.time()
-                self._highlight_button(self.center_btn, True)
-
-    def _on_button_release(self, event, button_name=None):
-        if not self.test_running:
+    def _on_button_press(self, event, zone):
+        if not self.engine.running:
+            return
+        if zone == self.engine.active_zone:
             return
 
-        if event:
-            if event.widget == self.corner_btn and self.corner_button_pressed:
-                elapsed = time.time() - self.corner_press_time
-                self.corner_time += elapsed
-                self.corner_button_pressed = False
-                self.corner_press_time = None
-                self._update_area_time_labels()
-                self._highlight_button(self.corner_btn, False)
-            elif event.widget == self.lateral_btn and self.lateral_button_pressed:
-                elapsed = time.time() - self.lateral_press_time
-                self.lateral_time += elapsed
-                self.lateral_button_pressed = False
-                self.lateral_press_time = None
-                self._update_area_time_labels()
-                self._highlight_button(self.lateral_btn, False)
-            elif event.widget == self.center_btn and self.center_button_pressed:
-                elapsed = time.time() - self.center_press_time
-                self.center_time += elapsed
-                self.center_button_pressed = False
-                self.center_press_time = None
-                self._update_area_time_labels()
-                self._highlight_button(self.center_btn, False)
-        elif button_name:
-            if button_name == "Canto" and self.corner_button_pressed:
-                elapsed = time.time() - self.corner_press_time
-                self.corner_time += elapsed
-                self.corner_button_pressed = False
-                self.corner_press_time = None
-                self._update_area_time_labels()
-                self._highlight_button(self.corner_btn, False)
-            elif button_name == "Lateral" and self.lateral_button_pressed:
-                elapsed = time.time() - self.lateral_press_time
-                self.lateral_time += elapsed
-                self.lateral_button_pressed = False
-                self.lateral_press_time = None
-                self._update_area_time_labels()
-                self._highlight_button(self.lateral_btn, False)
-            elif button_name == "Centro" and self.center_button_pressed:
-                elapsed = time.time() - self.center_press_time
-                self.center_time += elapsed
-                self.center_button_pressed = False
-                self.center_press_time = None
-                self._update_area_time_labels()
-                self._highlight_button(self.center_btn, False)
-
-    def _highlight_button(self, button, is_pressed):
-        original_bg = ""
-        if button == self.corner_btn:
-            original_bg = "red"
-        elif button == self.lateral_btn:
-            original_bg = "skyblue"
-        elif button == self.center_btn:
-            original_bg = "forestgreen"
+        event_t = self.event_clock.to_clock(event.time)
+        start = self.input_latency.begin(PRESS, event_t)
+
+        # Se um botão diferente estiver ativo, o motor encerra e contabiliza seu tempo
+        previous = self.engine.enter(zone, event_t)
+        if previous is not None:
+            self._update_area_time_label(previous)
+            self._highlight_button(previous, False)
+        self._highlight_button(zone, True)
+        self.input_latency.end(PRESS, start)
 
+    def _on_button_release(self, event, zone, received=None):
+        if not self.engine.running:
+            return
+        event_t = self.event_clock.to_clock(event.time)
+        start = self.input_latency.begin(RELEASE, event_t, received)
+        if self.engine.exit(zone, event_t):
+            self._update_area_time_label(zone)
+            self._highlight_button(zone, False)
+        self.input_latency.end(RELEASE, start)
+
+    def _key_zone(self, event):
+        zone = ZONE_KEYS.get(event.keysym)
+        if zone is None or zone >= len(self.zones) or isinstance(event.widget, tk.Entry):
+            return None
+        return zone
+
+    def _on_key_press(self, event):
+        zone = self._key_zone(event)
+        if zone is None:
+            return
+        pending = self.pending_key_release
+        if pending is not None and pending[0] == zone:
+            # Repetição automática: a tecla continua pressionada
+            self.master.after_cancel(pending[1])
+            self.pending_key_release = None
+            return
+        self._flush_key_release()
+        self._on_button_press(event, zone)
+
+    def _on_key_release(self, event):
+        zone = self._key_zone(event)
+        if zone is None:
+            return
+        # A soltura é confirmada depois, mas com o carimbo do próprio evento
+        self._flush_key_release()
+        after_id = self.master.after(AUTOREPEAT_MS, self._flush_key_release)
+        self.pending_key_release = (zone, after_id, event, self.input_latency.clock())
+
+    def _flush_key_release(self):
+        if self.pending_key_release is None:
+            return
+        zone, after_id, event, received = self.pending_key_release
+        self.pending_key_release = None
+        self.master.after_cancel(after_id)
+        self._on_button_release(event, zone, received)
+
+    def _highlight_button(self, zone, is_pressed):
+        button = self.area_buttons[zone]
         if is_pressed:
             button.config(relief="sunken", bg="darkgray")
         else:
-            button.config(relief="raised", bg=original_bg)
+            button.config(relief="raised", bg=self.zones[zone].color)
+
+    def _update_area_time_label(self, zone):
+        self.area_time_labels[zone].config(text=f"{zone_label(self.zones[zone])}: {to_seconds(self.engine.zone_time_ns(zone)):.2f} s")
 
     def _update_area_time_labels(self):
-        self.corner_time_label.config(text=f"Tempo no Canto: {self.corner_time:.2f} s")
-        self.lateral_time_label.config(text=f"Tempo na Lateral: {self.lateral_time:.2f} s")
-        self.center_time_label.config(text=f"Tempo no Centro: {self.center_time:.2f} s")
+        for zone in range(len(self.area_buttons)):
+            self._update_area_time_label(zone)
 
     def generate_report(self):
-        if not self.start_time:
+        if self.engine.start_time is None:
             messagebox.showinfo("Aviso", "Inicie um teste primeiro para gerar o relatório.")
             return
 
-        total_duration = self.test_duration.get()
-        # Calcula a duração efetiva do teste
-        if self.test_running: # Se o teste ainda está correndo, a duração efetiva é o tempo decorrido até agora
-             effective_duration = time.time() - self.start_time
-        else: # Se o teste já parou (automaticamente ou manualmente)
-             effective_duration = total_duration - self.remaining_time # Tempo total programado - tempo restante
-
-        # Garante que effective_duration não seja zero para evitar divisão por zero
-        if effective_duration <= 0:
-            effective_duration = 0.001 # Um valor mínimo para evitar erro, embora indique um teste sem duração relevante
-
-        # Calcula as porcentagens
-        corner_percent = (self.corner_time / effective_duration) * 100
-        lateral_percent = (self.lateral_time / effective_duration) * 100
-        center_percent = (self.center_time / effective_duration) * 100
-
-        # Formata o relatório
-        report = f"--- Relatório do Teste Open Field ---\n\n"
-        report += f"ID do Animal: {self.animal_id.get()}\n"
-        report += f"Data/Hora: {time.strftime('%Y-%m-%d %H:%M:%S')}\n"
-        report += f"Duração Programada do Teste: {total_duration} segundos\n"
-        report += f"Duração Efetiva do Teste: {effective_duration:.2f} segundos\n\n"
-        report += f"Tempo Acumulado nas Áreas:\n"
-        report += f"  Canto: {self.corner_time:.2f} segundos ({corner_percent:.2f}%)\n"
-        report += f"  Lateral: {self.lateral_time:.2f} segundos ({lateral_percent:.2f}%)\n"
-        report += f"  Centro: {self.center_time:.2f} segundos ({center_percent:.2f}%)\n\n"
-
-        # Exibir no campo de texto do relatório
-        self.report_text.config(state="normal")
-        self.report_text.delete("1.0", tk.END)
-        self.report_text.insert(tk.END, report)
-        self.report_text.config(state="disabled")
-
-        # Armazena os dados para o gráfico e exportação
-        self.test_data = {
-            "ID do Animal": self.animal_id.get(),
-            "Data/Hora": time.strftime("%Y-%m-%d %H:%M:%S"),
-            "Duração Programada (s)": total_duration,
-            "Duração Efetiva (s)": effective_duration,
-            "Tempo no Canto (s)": self.corner_time,
-            "Porcentagem no Canto (%)": corner_percent,
-            "Tempo na Lateral (s)": self.lateral_time,
-            "Porcentagem na Lateral (%)": lateral_percent,
-            "Tempo no Centro (s)": self.center_time,
-            "Porcentagem no Centro (%)": center_percent,
-        }
-
-        # Gera e exibe o gráfico de pizza
-        self.show_pie_chart(
-            self.test_data["Tempo no Canto (s)"],
-            self.test_data["Tempo na Lateral (s)"],
-            self.test_data["Tempo no Centro (s)"]
-        )
-
-
-    def show_pie_chart(self, corner_time, lateral_time, center_time):
-        # Limpa o frame do gráfico antes de desenhar um novo
-        for widget in self.chart_frame.winfo_children():
-            widget.destroy()
-
-        labels = ['Canto', 'Lateral', 'Centro']
-        sizes = [corner_time, lateral_time, center_time]
-        colors = ['red', 'skyblue', 'forestgreen']
-
-        # Remove áreas com tempo zero para não aparecerem no gráfico
-        filtered_labels = []
-        filtered_sizes = []
-        filtered_colors = []
-        for i, size in enumerate(sizes):
-            if size > 0:
-                filtered_sizes.append(size)
-                filtered_labels.append(labels[i])
-                filtered_colors.append(colors[i])
-
-        if not filtered_sizes:
-            # Se todos os tempos forem zero, não há gráfico para mostrar
-            tk.Label(self.chart_frame, text="Nenhum tempo registrado para exibir o gráfico.", fg="gray").pack(pady=20)
-            return
+        # Monta o relatório e guarda os dados para o gráfico e a exportação
+        self.test_data = build_report(self.report, self.engine, self.zones, self.occupancy, self.bout_stats,
+                                      self.animal_id.get(), latency=self.input_latency)
 
-        # Cria a figura para o gráfico de pizza
-        fig = plt.Figure(figsize=(5, 4), dpi=100) # Tamanho da figura (largura, altura)
-        ax = fig.add_subplot(111)
+        # Exibir no campo de texto do relatório (apenas as linhas alteradas)
+        self._ensure_report_pane()
+        self.report.render(self.report_sink)
 
-        # autopct='%1.1f%%' formata a porcentagem com uma casa decimal
-        # startangle=90 faz a primeira fatia começar no topo
-        wedges, texts, autotexts = ax.pie(filtered_sizes, labels=filtered_labels, colors=filtered_colors,
-                                          autopct='%1.1f%%', startangle=90, pctdistance=0.85)
+        # Atualiza o gráfico de pizza, a menos que os tempos não tenham mudado
+        self._refresh_chart([self.engine.zone_time_ns(zone) for zone in range(len(self.zones))])
 
-        # Ajusta a cor do texto de porcentagem para ser legível
-        for autotext in autotexts:
-            autotext.set_color('black')
-            autotext.set_fontsize(10)
-        for text in texts:
-            text.set_fontsize(10)
 
-        ax.axis('equal')  # Garante que o círculo seja desenhado como um círculo.
-        ax.set_title("Distribuição de Tempo por Área")
+    def _refresh_chart(self, zone_times_ns):
+        # O gráfico só é redesenhado se os tempos por área mudaram
+        chart_key = tuple(zone_times_ns)
+        if chart_key != self.chart_key:
+            self.chart_key = chart_key
+            self.show_pie_chart(zone_times_ns)
 
-        # Integra o gráfico ao Tkinter
-        canvas = FigureCanvasTkAgg(fig, master=self.chart_frame)
-        canvas_widget = canvas.get_tk_widget()
-        canvas_widget.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+    def show_pie_chart(self, zone_times):
+        # Uma única figura, criada no primeiro uso; as fatias são atualizadas no lugar
+        self._ensure_chart()
+        self.chart.update(zone_times)
 
-        # Adiciona a barra de ferramentas do Matplotlib (zoom, pan, save)
-        toolbar = NavigationToolbar2Tk(canvas, self.chart_frame)
-        toolbar.update()
-        canvas_widget.pack(side=tk.TOP, fill=tk.BOTH, expand=True) # Repack para garantir que a barra de ferramentas apareça
+    def _ensure_chart(self):
+        # O Matplotlib só é importado aqui, fora da abertura da janela
+        if self.chart is None:
+            self.chart = TkPieChart(self.chart_frame, self.zones)
 
+    def _ensure_report_pane(self):
+        if self.report_text is None:
+            self.report_placeholder.destroy()
+            self.report_text = tk.Text(self.report_frame, height=8, state="disabled", wrap="word")
+            self.report_text.grid(row=0, column=0, pady=5, padx=5, sticky="nsew")
+            self.report_sink = TkTextSink(self.report_text)
 
     def export_report(self):
         if not self.test_data:
@@ -461,11 +466,18 @@ class OpenFieldApp:
             report_content = self.report_text.get("1.0", tk.END)
             with open(filepath, mode='w', encoding='utf-8') as file:
                 file.write(report_content)
+            # Distribuição completa das latências de entrada, ao lado do relatório
+            self.input_latency.dump(latency_path(filepath))
             messagebox.showinfo("Exportação Concluída", f"Relatório exportado com sucesso para:\n{filepath}")
         except Exception as e:
             messagebox.showerror("Erro na Exportação", f"Ocorreu um erro ao exportar o relatório: {e}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Teste de Campo Aberto - Marcação de Áreas")
+    parser.add_argument("--arena", choices=sorted(ARENAS), default="padrao",
+                        help="Configuração de áreas da arena (padrão: Canto/Lateral/Centro)")
+    args = parser.parse_args()
+
     root = tk.Tk()
-    app = OpenFieldApp(root)
+    app = OpenFieldApp(root, zones=ARENAS[args.arena])
     root.mainloop()
\ No newline at end of file
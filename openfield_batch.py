@@ -0,0 +1,120 @@
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from journal import JOURNAL_DIR, JOURNAL_EXT, RECORD, START
+from replay import replay_journal, to_test_data
+from zones import ARENAS, arena_for
+
+# Pontuação em lote: calcula o resumo (test_data) de cada sessão gravada em
+# um diretório de diários e grava uma tabela agregada, sem abrir a interface.
+# As sessões são distribuídas entre processos e cada linha é gravada assim
+# que fica pronta. Arenas diferentes têm colunas diferentes, então com mais de
+# um tipo de arena no diretório cada tipo vai para a sua própria tabela
+# (<saída>_<arena>.csv).
+
+
+def score_session(path):
+    result = replay_journal(path)
+    test_data = {"Arquivo": os.path.basename(path)}
+    test_data.update(to_test_data(result, arena_for(len(result.zone_times_ns))))
+    return test_data, os.path.getsize(path)
+
+
+def find_journals(directory):
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(JOURNAL_EXT)
+    )
+
+
+def journal_n_zones(path):
+    # Número de zonas lido só do registro START, sem carregar o diário
+    with open(path, "rb") as file:
+        header = file.read(RECORD.size)
+    if len(header) < RECORD.size or header[0] != START:
+        raise ValueError(f"{path}: diário sem registro START")
+    return RECORD.unpack(header)[1]
+
+
+def arena_name(n_zones):
+    zones = arena_for(n_zones)
+    return next(name for name, arena_zones in ARENAS.items() if arena_zones == zones)
+
+
+def table_paths(output, arenas):
+    # Um tipo de arena: a tabela pedida; vários: uma tabela por arena
+    if len(arenas) == 1:
+        return {arenas[0]: output}
+    base, ext = os.path.splitext(output)
+    return {n_zones: f"{base}_{arena_name(n_zones)}{ext or '.csv'}" for n_zones in arenas}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pontua em lote um diretório de sessões gravadas")
+    parser.add_argument("directory", nargs="?", default=JOURNAL_DIR, help="Diretório com os diários (.ofj)")
+    parser.add_argument("-o", "--output", default="resumo_sessoes.csv", help="Tabela agregada (CSV)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Número de processos (padrão: CPUs)")
+    args = parser.parse_args()
+
+    paths = find_journals(args.directory)
+    if not paths:
+        print(f"Nenhum diário encontrado em {args.directory}", file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    done = 0
+    total_bytes = 0
+    errors = 0
+    session_zones = {}
+    for path in paths:
+        try:
+            session_zones[path] = journal_n_zones(path)
+            arena_for(session_zones[path])
+        except (OSError, ValueError) as e:
+            errors += 1
+            session_zones.pop(path, None)
+            print(f"Erro em {path}: {e}", file=sys.stderr)
+    outputs = table_paths(args.output, sorted(set(session_zones.values())))
+
+    files = {n_zones: open(path, "w", newline="", encoding="utf-8") for n_zones, path in outputs.items()}
+    writers = {}
+    try:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            futures = {executor.submit(score_session, path): path for path in session_zones}
+            for future in as_completed(futures):
+                try:
+                    test_data, size = future.result()
+                except Exception as e:
+                    errors += 1
+                    print(f"Erro em {futures[future]}: {e}", file=sys.stderr)
+                    continue
+
+                # Todas as sessões de uma tabela são da mesma arena (mesmas colunas)
+                n_zones = session_zones[futures[future]]
+                if n_zones not in writers:
+                    writers[n_zones] = csv.DictWriter(files[n_zones], fieldnames=list(test_data))
+                    writers[n_zones].writeheader()
+                writers[n_zones].writerow(test_data)
+                files[n_zones].flush()
+
+                done += 1
+                total_bytes += size
+                elapsed = time.perf_counter() - start
+                print(f"[{done}/{len(paths)}] {test_data['ID do Animal']} "
+                      f"({done / elapsed:.1f} sessões/s)", file=sys.stderr)
+    finally:
+        for file in files.values():
+            file.close()
+
+    elapsed = time.perf_counter() - start
+    events = total_bytes // RECORD.size
+    print(f"{done} sessões em {elapsed:.2f} s: {done / elapsed:.1f} sessões/s, "
+          f"~{events / elapsed / 1e6:.2f} milhões de eventos/s -> {', '.join(outputs.values())}", file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
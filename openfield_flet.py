@@ -1,10 +1,9 @@
 import flet as ft
 import time
 import asyncio
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-import base64
-import io
+
+from charts import FletPieChart
+from zones import DEFAULT_ZONES
 
 
 class OpenFieldApp:
@@ -60,6 +59,7 @@ class OpenFieldApp:
         self.center_time_text = None
         self.report_text = None
         self.chart_container = None
+        self.pie_chart = None
         
         self.create_ui()
         
@@ -687,58 +687,11 @@ class OpenFieldApp:
         self.page.update()
     
     def show_pie_chart(self):
-        labels = ['Canto', 'Lateral', 'Centro']
-        sizes = [self.corner_time, self.lateral_time, self.center_time]
-        colors = ['red', 'skyblue', 'forestgreen']
-        
-        # Remove áreas com tempo zero
-        filtered_data = [(label, size, color) for label, size, color in zip(labels, sizes, colors) if size > 0]
-        
-        if not filtered_data:
-            self.chart_container.content = ft.Text(
-                "Nenhum tempo registrado para exibir o gráfico.",
-                text_align=ft.TextAlign.CENTER,
-                color="#6B7280"
-            )
-            return
-        
-        filtered_labels, filtered_sizes, filtered_colors = zip(*filtered_data)
-        
-        # Cria o gráfico
-        fig, ax = plt.subplots(figsize=(6, 5))
-        wedges, texts, autotexts = ax.pie(
-            filtered_sizes,
-            labels=filtered_labels,
-            colors=filtered_colors,
-            autopct='%1.1f%%',
-            startangle=90,
-            pctdistance=0.85
-        )
-        
-        # Ajusta o texto
-        for autotext in autotexts:
-            autotext.set_color('black')
-            autotext.set_fontsize(10)
-        for text in texts:
-            text.set_fontsize(10)
-        
-        ax.axis('equal')
-        ax.set_title("Distribuição de Tempo por Área", fontsize=12, fontweight='bold')
-        
-        # Converte para base64
-        buffer = io.BytesIO()
-        plt.savefig(buffer, format='png', bbox_inches='tight', dpi=100)
-        buffer.seek(0)
-        image_data = base64.b64encode(buffer.getvalue()).decode()
-        plt.close()
-        
-        # Exibe a imagem
-        self.chart_container.content = ft.Image(
-            src_base64=image_data,
-            width=350,
-            height=250,
-            fit=ft.ImageFit.CONTAIN
-        )
+        # Gráfico nativo do Flet: criado uma vez, depois só os valores das fatias mudam
+        if self.pie_chart is None:
+            self.pie_chart = FletPieChart(DEFAULT_ZONES)
+            self.chart_container.content = self.pie_chart.control
+        self.pie_chart.update([self.corner_time, self.lateral_time, self.center_time])
     
     def export_report(self, e):
         if not self.test_data:
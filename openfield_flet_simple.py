@@ -1,43 +1,141 @@
+import argparse
 import flet as ft
+import os
 import time
 import asyncio
-import matplotlib.pyplot as plt
-import base64
-import io
+
+from charts import FletPieChart, save_pie_png
+from clock import NS_PER_SECOND, default_clock, to_seconds
+from flet_updates import TrafficMeter, UpdateScheduler
+from journal import JOURNAL_DIR, SessionJournal, journal_path, recover_session
+from latency import PRESS, RELEASE, InputLatency, latency_path
+from metrics import BoutStats, OccupancyBins
+from profiling import SessionProfiler, profile_base
+from report import ControlListSink, ReportModel, build_report
+from scoring import ScoringEngine
+from ticker import TICK_SECONDS, SharedTicker
+from zones import ARENAS, DEFAULT_ZONES, zone_label
+
+# No modo servidor cada estação que se conecta cria o seu app: os diários
+# ficam num subdiretório próprio e não há recuperação automática, senão a
+# estação recém-conectada assumiria a sessão em andamento de outra estação
+SERVER_JOURNAL_DIR = os.path.join(JOURNAL_DIR, "servidor")
 
 
 class OpenFieldApp:
-    def __init__(self, page: ft.Page):
+    def __init__(self, page: ft.Page, zones=DEFAULT_ZONES, clock=default_clock, show_traffic=False,
+                 ticker=None):
         self.page = page
         self.page.title = "Teste de Campo Aberto - Marcação de Áreas"
         
+        # Os handlers só marcam os controles alterados; o agendador envia todos
+        # juntos uma vez por quadro. O medidor conta o tráfego para o cliente
+        # (só com --trafego: ele serializa cada mensagem para medir o tamanho)
+        self.show_traffic = show_traffic
+        self.meter = None
+        if show_traffic:
+            self.meter = TrafficMeter()
+            self.meter.install(page)
+        # Perfil opcional da sessão (cProfile + tracemalloc) entre start_test e stop_test
+        self.profiler = SessionProfiler()
+        self.updates = UpdateScheduler(page, meter=self.meter, profiler=self.profiler)
+        
+        # No modo servidor um único relógio compartilhado (ticker) atualiza
+        # todas as sessões; sem ele cada página tem o seu timer_loop
+        self.ticker = ticker
+        self.journal_dir = JOURNAL_DIR if ticker is None else SERVER_JOURNAL_DIR
+        
         # Variáveis do teste
-        self.test_running = False
-        self.start_time = None
-        self.remaining_time = 0
         self.animal_id = ""
-        self.test_duration = 300
         
-        # Variáveis para armazenar o tempo acumulado em cada área
-        self.corner_time = 0.0
-        self.lateral_time = 0.0
-        self.center_time = 0.0
+        # Tabela de áreas da arena (padrão: Canto, Lateral, Centro)
+        self.zones = zones
         
-        # Variáveis para controlar se um botão de área está atualmente pressionado
-        self.corner_button_pressed = False
-        self.lateral_button_pressed = False
-        self.center_button_pressed = False
+        # Toda a contabilidade de tempo das áreas fica no motor de pontuação
+        # (o relógio é injetável para simular sessões com um relógio falso)
+        self.engine = ScoringEngine(n_zones=len(zones), clock=clock)
+        self.journal = None
         
-        # Variáveis para registrar o tempo de início da pressão do botão
-        self.corner_press_time = None
-        self.lateral_press_time = None
-        self.center_press_time = None
+        # Ocupação por intervalo de tempo, acumulada durante o teste
+        self.occupancy = OccupancyBins(len(zones))
+        self.engine.listeners.append(self.occupancy)
+        
+        # Entradas, latências e estatísticas das permanências, atualizadas a cada transição
+        self.bout_stats = BoutStats(len(zones))
+        self.engine.listeners.append(self.bout_stats)
+        
+        # Tempo gasto nos handlers de marcação (os eventos do Flet não trazem
+        # o instante de origem, então a espera evento->handler não é medida)
+        self.input_latency = InputLatency(clock)
         
         # Dados do teste para relatório
         self.test_data = {}
+        self.chart_key = None  # Tempos por área exibidos no gráfico atual
+        self.pie_chart = None
+        
+        # O timer fica parado num evento enquanto não há teste em andamento
+        # (start_test o acorda) e os laços terminam quando a página desconecta.
+        # Cada início dos laços ganha uma geração nova: os laços de uma geração
+        # anterior ainda dormindo (reconexão logo após a queda) saem ao acordar
+        self.timer_wake = asyncio.Event()
+        self.loop = None
+        self.closed = False
+        self.generation = 0
+        self.page.on_connect = self.on_connect
+        self.page.on_disconnect = self.on_disconnect
+        self.page.on_close = self.on_close
         
         self.create_ui()
-        self.page.run_task(self.timer_loop)
+        if self.ticker is None:
+            self.recover_session()
+        self.start_loops()
+    
+    def start_loops(self):
+        self.closed = False
+        self.generation += 1
+        self.page.run_task(self.updates.run)
+        if self.ticker is None:
+            self.page.run_task(self.timer_loop, self.generation)
+        else:
+            self.ticker.ensure_running(self.page)
+            if self.engine.running:
+                self.ticker.activate(self)
+        if self.show_traffic:
+            self.page.run_task(self.traffic_loop, self.generation)
+    
+    def stop_loops(self):
+        self.closed = True
+        self.generation += 1
+        self.updates.close()
+        if self.ticker is not None:
+            self.ticker.remove(self)
+        self.wake_timer()
+    
+    def wake_timer(self):
+        if self.ticker is not None:
+            if not self.closed:
+                self.ticker.activate(self)
+            return
+        # Os handlers rodam fora do laço de eventos da página
+        if self.loop is None:
+            self.timer_wake.set()
+        else:
+            self.loop.call_soon_threadsafe(self.timer_wake.set)
+    
+    def on_connect(self, e):
+        # Reconexão (ex.: página recarregada): o teste continua pelo relógio do motor
+        if self.closed:
+            self.start_loops()
+    
+    def on_disconnect(self, e):
+        self.stop_loops()
+        if self.journal is not None:
+            self.journal.sync()
+    
+    def on_close(self, e):
+        # Sessão expirada: o diário fica sem STOP e o teste pode ser restaurado depois
+        self.stop_loops()
+        self.close_journal()
     
     def create_ui(self):
         # Campos de configuração
@@ -52,6 +150,14 @@ class OpenFieldApp:
             value="300"
         )
         
+        self.bin_field = ft.TextField(
+            label="Intervalo de Análise (segundos)",
+            width=300,
+            value="60"
+        )
+        
+        self.profile_checkbox = ft.Checkbox(label="Medir desempenho desta sessão (perfil)", value=False)
+        
         # Timer e controles
         self.timer_text = ft.Text(
             "Tempo Restante: 00:00",
@@ -79,46 +185,36 @@ class OpenFieldApp:
         )
         
         # Botões de área
-        self.corner_button = ft.ElevatedButton(
-            "CANTO",
-            on_click=lambda e: self.toggle_area_button("corner"),
-            bgcolor="#F44336",
-            color="#FFFFFF",
-            width=200,
-            height=80,
-            disabled=True
-        )
-        
-        self.lateral_button = ft.ElevatedButton(
-            "LATERAL",
-            on_click=lambda e: self.toggle_area_button("lateral"),
-            bgcolor="#2196F3",
-            color="#FFFFFF",
-            width=200,
-            height=80,
-            disabled=True
-        )
-        
-        self.center_button = ft.ElevatedButton(
-            "CENTRO",
-            on_click=lambda e: self.toggle_area_button("center"),
-            bgcolor="#4CAF50",
-            color="#FFFFFF",
-            width=200,
-            height=80,
-            disabled=True
-        )
-        
-        # Labels de tempo
-        self.corner_time_text = ft.Text("Tempo no Canto: 0.00 s")
-        self.lateral_time_text = ft.Text("Tempo na Lateral: 0.00 s")
-        self.center_time_text = ft.Text("Tempo no Centro: 0.00 s")
-        
-        # Relatório
-        self.report_text = ft.Text(
-            "Nenhum relatório gerado ainda.",
-            selectable=True
+        # Botões de área e labels de tempo, gerados a partir da tabela de zonas.
+        # Controles indexados pelo id da zona no motor de pontuação
+        n_cols = max(zone.col + zone.colspan for zone in self.zones)
+        button_width, button_height = (200, 80) if n_cols <= 2 else (400 // n_cols - 10, 60)
+        self.area_buttons = []
+        self.area_time_texts = []
+        for zone_id, zone in enumerate(self.zones):
+            self.area_buttons.append(ft.ElevatedButton(
+                zone.name.upper(),
+                on_click=lambda e, z=zone_id: self.profiler.runcall(self.toggle_area_button, z),
+                bgcolor=zone.flet_color,
+                color="#FFFFFF",
+                width=button_width,
+                height=button_height,
+                disabled=True
+            ))
+            self.area_time_texts.append(ft.Text(f"{zone_label(zone)}: 0.00 s"))
+        
+        button_rows = {}
+        for zone, button in zip(self.zones, self.area_buttons):
+            button_rows.setdefault(zone.row, []).append(button)
+        
+        # Relatório: uma linha por controle, para atualizar só as linhas alteradas
+        self.report_column = ft.Column(
+            [ft.Text("Nenhum relatório gerado ainda.", selectable=True)],
+            spacing=0,
+            scroll=ft.ScrollMode.AUTO
         )
+        self.report = ReportModel()
+        self.report_sink = ControlListSink(self.report_column, lambda text: ft.Text(text, selectable=True))
         
         # Container para o gráfico
         self.chart_container = ft.Container(
@@ -133,24 +229,23 @@ class OpenFieldApp:
             ft.Text("Configurações do Teste", size=20, weight=ft.FontWeight.BOLD),
             self.animal_id_field,
             self.duration_field,
+            self.bin_field,
+            self.profile_checkbox,
             ft.Divider(),
             ft.Text("Controle do Teste", size=20, weight=ft.FontWeight.BOLD),
             self.timer_text,
             ft.Row([self.start_button, self.stop_button], alignment=ft.MainAxisAlignment.CENTER),
             ft.Divider(),
             ft.Text("Marcação de Áreas", size=20, weight=ft.FontWeight.BOLD),
-            ft.Row([self.corner_button, self.lateral_button], alignment=ft.MainAxisAlignment.CENTER),
-            ft.Row([self.center_button], alignment=ft.MainAxisAlignment.CENTER),
+            *[ft.Row(buttons, alignment=ft.MainAxisAlignment.CENTER) for _, buttons in sorted(button_rows.items())],
             ft.Divider(),
-            self.corner_time_text,
-            self.lateral_time_text,
-            self.center_time_text,
+            *self.area_time_texts,
         ], width=400, scroll=ft.ScrollMode.AUTO)
         
         right_column = ft.Column([
             ft.Text("Relatório do Teste", size=20, weight=ft.FontWeight.BOLD),
             ft.Container(
-                content=self.report_text,
+                content=self.report_column,
                 padding=10,
                 border=ft.border.all(1, "#E0E0E0"),
                 border_radius=4,
@@ -187,262 +282,249 @@ class OpenFieldApp:
             self.show_snack_bar("Por favor, insira uma duração válida.", "#F44336")
             return
         
-        # Inicia o teste
-        self.test_running = True
-        self.start_time = time.time()
-        self.remaining_time = duration
+        try:
+            bin_seconds = int(self.bin_field.value)
+            if bin_seconds <= 0:
+                raise ValueError
+        except ValueError:
+            self.show_snack_bar("Por favor, insira um intervalo de análise válido.", "#F44336")
+            return
+        self.occupancy.bin_ns = bin_seconds * NS_PER_SECOND
+        
         self.animal_id = self.animal_id_field.value.strip()
-        self.test_duration = duration
-        
-        # Reset das variáveis
-        self.corner_time = 0.0
-        self.lateral_time = 0.0
-        self.center_time = 0.0
-        self.corner_button_pressed = False
-        self.lateral_button_pressed = False
-        self.center_button_pressed = False
-        self.corner_press_time = None
-        self.lateral_press_time = None
-        self.center_press_time = None
+        
+        # Cada evento da sessão é anexado ao diário para recuperação após quedas
+        self.close_journal()
+        try:
+            self.journal = SessionJournal(journal_path(self.animal_id, self.journal_dir), self.animal_id)
+        except RuntimeError as ex:
+            self.show_snack_bar(str(ex), "#F44336")
+            return
+        self.engine.listeners.append(self.journal)
+        
+        if self.profile_checkbox.value:
+            try:
+                self.profiler.start(ui_thread=False)
+            except ValueError as ex:
+                self.show_snack_bar(f"Não foi possível medir o desempenho: {ex}", "#FF9800")
+        
+        # Inicia o teste (o motor zera tempos, área ativa e registro de permanências)
+        self.engine.start(duration)
+        self.begin_session_ui()
+    
+    def begin_session_ui(self):
         self.test_data = {}
+        self.input_latency.clear()
         
         # Atualiza interface
         self.start_button.disabled = True
         self.stop_button.disabled = False
-        self.corner_button.disabled = False
-        self.lateral_button.disabled = False
-        self.center_button.disabled = False
+        for button in self.area_buttons:
+            button.disabled = False
         
         self.update_area_time_labels()
-        self.page.update()
+        self.updates.mark(self.start_button, self.stop_button, *self.area_buttons)
+        self.wake_timer()
     
     def stop_test(self, e=None, manual_stop=True):
-        if not self.test_running:
+        if not self.engine.running:
             return
         
-        self.test_running = False
-        
         # Finaliza qualquer botão pressionado
-        if self.corner_button_pressed:
-            self.release_area_button("corner")
-        if self.lateral_button_pressed:
-            self.release_area_button("lateral")
-        if self.center_button_pressed:
-            self.release_area_button("center")
+        active_zone = self.engine.active_zone
+        self.engine.stop()
+        journal = self.detach_journal()
+        if active_zone is not None:
+            self.area_buttons[active_zone].bgcolor = self.zones[active_zone].flet_color
         
         # Atualiza interface
         self.start_button.disabled = False
         self.stop_button.disabled = True
-        self.corner_button.disabled = True
-        self.lateral_button.disabled = True
-        self.center_button.disabled = True
+        for button in self.area_buttons:
+            button.disabled = True
         
         self.update_area_time_labels()
         self.generate_report(None)
         
+        # Perfil encerrado aqui; as estatísticas vão para o disco com o mesmo
+        # nome-base do relatório exportado
+        profile_path = profile_base(self.animal_id) if self.profiler.active else None
+        self.profiler.stop()
+        self.in_background(self.finish_files, journal, profile_path, manual_stop)
+        
+        self.updates.mark(self.start_button, self.stop_button, *self.area_buttons)
+    
+    def in_background(self, function, *args):
+        # Acesso a disco fora do laço de eventos: no modo servidor o fim do
+        # teste por tempo roda no relógio compartilhado, que atende todas as
+        # estações. Nos handlers (threads do executor) roda ali mesmo
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            function(*args)
+            return
+        loop.run_in_executor(None, function, *args)
+    
+    def finish_files(self, journal, profile_path, manual_stop):
+        # Fecha o diário (espera a thread de gravação e o fsync) e grava o perfil
+        if journal is not None:
+            journal.close()
+        profile_paths = []
+        if profile_path is not None:
+            try:
+                profile_paths = self.profiler.write(profile_path)
+            except Exception as ex:
+                self.show_snack_bar(f"Erro ao gravar o perfil: {ex}", "#F44336")
+                return
+        profile_message = f" Perfil gravado em {', '.join(profile_paths)}." if profile_paths else ""
         if manual_stop:
-            self.show_snack_bar(f"Teste para {self.animal_id} finalizado!", "#4CAF50")
+            self.show_snack_bar(f"Teste para {self.animal_id} finalizado!{profile_message}", "#4CAF50")
+        elif profile_paths:
+            self.show_snack_bar(profile_message.strip(), "#4CAF50")
+    
+    def detach_journal(self):
+        # Tira o diário do motor e o retorna, ainda aberto (ou None)
+        journal, self.journal = self.journal, None
+        if journal is not None:
+            self.engine.listeners.remove(journal)
+        return journal
+    
+    def close_journal(self):
+        journal = self.detach_journal()
+        if journal is not None:
+            journal.close()
+    
+    def recover_session(self):
+        # Restaura a sessão interrompida por uma queda do programa, se houver
+        session, journal = recover_session(self.engine)
+        if session is None:
+            return
         
-        self.page.update()
+        self.animal_id = session.animal_id
+        self.animal_id_field.value = session.animal_id
+        self.duration_field.value = str(session.duration)
+        if journal is None:
+            self.update_area_time_labels()
+            self.generate_report(None)
+            self.show_snack_bar(f"O teste de {session.animal_id} terminou com o programa fechado. Relatório restaurado.", "#FF9800")
+            return
+        
+        self.journal = journal
+        self.engine.listeners.append(journal)
+        self.begin_session_ui()
+        self.show_snack_bar(f"Teste de {session.animal_id} restaurado do diário e em andamento.", "#FF9800")
     
     def toggle_area_button(self, area):
-        if not self.test_running:
+        if not self.engine.running:
             return
         
         # Se o botão já está pressionado, libera
-        if (area == "corner" and self.corner_button_pressed) or \
-           (area == "lateral" and self.lateral_button_pressed) or \
-           (area == "center" and self.center_button_pressed):
+        if area == self.engine.active_zone:
+            start = self.input_latency.begin(RELEASE)
             self.release_area_button(area)
+            self.input_latency.end(RELEASE, start)
         else:
-            # Libera qualquer outro botão pressionado
-            if self.corner_button_pressed:
-                self.release_area_button("corner")
-            if self.lateral_button_pressed:
-                self.release_area_button("lateral")
-            if self.center_button_pressed:
-                self.release_area_button("center")
-            
-            # Pressiona o novo botão
+            # O motor libera qualquer outro botão pressionado ao entrar na nova área
+            start = self.input_latency.begin(PRESS)
             self.press_area_button(area)
+            self.input_latency.end(PRESS, start)
     
     def press_area_button(self, area):
-        current_time = time.time()
-        
-        if area == "corner":
-            self.corner_button_pressed = True
-            self.corner_press_time = current_time
-            self.corner_button.bgcolor = "#424242"
-        elif area == "lateral":
-            self.lateral_button_pressed = True
-            self.lateral_press_time = current_time
-            self.lateral_button.bgcolor = "#424242"
-        elif area == "center":
-            self.center_button_pressed = True
-            self.center_press_time = current_time
-            self.center_button.bgcolor = "#424242"
-        
-        self.page.update()
+        previous = self.engine.enter(area)
+        if previous is not None:
+            self.area_buttons[previous].bgcolor = self.zones[previous].flet_color
+            self.update_area_time_label(previous)
+        self.area_buttons[area].bgcolor = "#424242"
+        
+        self.updates.mark(self.area_buttons[area])
+        if previous is not None:
+            self.updates.mark(self.area_buttons[previous])
     
     def release_area_button(self, area):
-        current_time = time.time()
-        
-        if area == "corner" and self.corner_button_pressed:
-            elapsed = current_time - self.corner_press_time
-            self.corner_time += elapsed
-            self.corner_button_pressed = False
-            self.corner_press_time = None
-            self.corner_button.bgcolor = "#F44336"
-        elif area == "lateral" and self.lateral_button_pressed:
-            elapsed = current_time - self.lateral_press_time
-            self.lateral_time += elapsed
-            self.lateral_button_pressed = False
-            self.lateral_press_time = None
-            self.lateral_button.bgcolor = "#2196F3"
-        elif area == "center" and self.center_button_pressed:
-            elapsed = current_time - self.center_press_time
-            self.center_time += elapsed
-            self.center_button_pressed = False
-            self.center_press_time = None
-            self.center_button.bgcolor = "#4CAF50"
+        if self.engine.exit(area):
+            self.area_buttons[area].bgcolor = self.zones[area].flet_color
         
-        self.update_area_time_labels()
-        self.page.update()
+        self.update_area_time_label(area)
+        self.updates.mark(self.area_buttons[area])
+    
+    def update_area_time_label(self, zone):
+        self.area_time_texts[zone].value = f"{zone_label(self.zones[zone])}: {to_seconds(self.engine.zone_time_ns(zone)):.2f} s"
+        self.updates.mark(self.area_time_texts[zone])
     
     def update_area_time_labels(self):
-        current_time = time.time()
-        
-        corner_display = self.corner_time
-        if self.corner_button_pressed and self.corner_press_time:
-            corner_display += current_time - self.corner_press_time
-        
-        lateral_display = self.lateral_time
-        if self.lateral_button_pressed and self.lateral_press_time:
-            lateral_display += current_time - self.lateral_press_time
-        
-        center_display = self.center_time
-        if self.center_button_pressed and self.center_press_time:
-            center_display += current_time - self.center_press_time
-        
-        self.corner_time_text.value = f"Tempo no Canto: {corner_display:.2f} s"
-        self.lateral_time_text.value = f"Tempo na Lateral: {lateral_display:.2f} s"
-        self.center_time_text.value = f"Tempo no Centro: {center_display:.2f} s"
+        for zone in range(len(self.zones)):
+            self.update_area_time_label(zone)
     
-    async def timer_loop(self):
-        while True:
-            if self.test_running:
-                elapsed_total_time = time.time() - self.start_time
-                self.remaining_time = self.test_duration - elapsed_total_time
-                
-                self.update_area_time_labels()
-                
-                if self.remaining_time <= 0:
-                    self.remaining_time = 0
-                    self.timer_text.value = "Tempo Restante: 00:00"
-                    self.stop_test(manual_stop=False)
-                else:
-                    mins = int(self.remaining_time // 60)
-                    secs = int(self.remaining_time % 60)
-                    self.timer_text.value = f"Tempo Restante: {mins:02d}:{secs:02d}"
-                
-                self.page.update()
+    async def timer_loop(self, generation):
+        self.loop = asyncio.get_running_loop()
+        while generation == self.generation:
+            # Limpa antes de conferir o estado: um start_test entre as duas
+            # linhas deixa o evento marcado e o laço não fica parado à toa
+            self.timer_wake.clear()
+            if not self.engine.running:
+                await self.timer_wake.wait()
+                continue
             
-            await asyncio.sleep(0.2)
+            self.profiler.runcall(self.tick_ui)
+            await asyncio.sleep(TICK_SECONDS)
+    
+    def tick_ui(self):
+        # Um quadro do timer; retorna False quando o teste terminou.
+        # Chamado pelo timer_loop da página ou pelo relógio compartilhado do servidor
+        if not self.engine.running:
+            return False
+        remaining_ns = self.engine.tick()
+        
+        # Apenas o tempo da área ativa muda entre os ticks
+        if self.engine.active_zone is not None:
+            self.update_area_time_label(self.engine.active_zone)
+        
+        if remaining_ns <= 0:
+            self.timer_text.value = "Tempo Restante: 00:00"
+            self.updates.mark(self.timer_text)
+            self.stop_test(manual_stop=False)
+            return False
+        mins, secs = divmod(remaining_ns // NS_PER_SECOND, 60)
+        self.timer_text.value = f"Tempo Restante: {mins:02d}:{secs:02d}"
+        self.updates.mark(self.timer_text)
+        return True
+    
+    async def traffic_loop(self, generation):
+        # Tráfego enviado ao cliente, uma linha por segundo no terminal
+        while True:
+            await asyncio.sleep(1)
+            if generation != self.generation:
+                return
+            messages_per_second, bytes_per_second = self.meter.rates()
+            print(f"Tráfego: {messages_per_second:.1f} mensagens/s, {bytes_per_second / 1024:.1f} KiB/s "
+                  f"({self.updates.flushes} atualizações agrupadas)")
     
     def generate_report(self, e):
-        if not self.start_time:
+        if self.engine.start_time is None:
             self.show_snack_bar("Inicie um teste primeiro para gerar o relatório.", "#FF9800")
             return
         
-        total_duration = self.test_duration
+        self.test_data = build_report(self.report, self.engine, self.zones, self.occupancy, self.bout_stats,
+                                      self.animal_id, latency=self.input_latency)
         
-        if self.test_running:
-            effective_duration = time.time() - self.start_time
-        else:
-            effective_duration = total_duration - self.remaining_time
-        
-        if effective_duration <= 0:
-            effective_duration = 0.001
-        
-        corner_percent = (self.corner_time / effective_duration) * 100
-        lateral_percent = (self.lateral_time / effective_duration) * 100
-        center_percent = (self.center_time / effective_duration) * 100
-        
-        report = f"--- Relatório do Teste Open Field ---\n\n"
-        report += f"ID do Animal: {self.animal_id}\n"
-        report += f"Data/Hora: {time.strftime('%Y-%m-%d %H:%M:%S')}\n"
-        report += f"Duração Programada: {total_duration} segundos\n"
-        report += f"Duração Efetiva: {effective_duration:.2f} segundos\n\n"
-        report += f"Tempo Acumulado nas Áreas:\n"
-        report += f"  Canto: {self.corner_time:.2f} s ({corner_percent:.2f}%)\n"
-        report += f"  Lateral: {self.lateral_time:.2f} s ({lateral_percent:.2f}%)\n"
-        report += f"  Centro: {self.center_time:.2f} s ({center_percent:.2f}%)\n"
-        
-        self.report_text.value = report
-        
-        self.test_data = {
-            "ID do Animal": self.animal_id,
-            "Data/Hora": time.strftime("%Y-%m-%d %H:%M:%S"),
-            "Duração Programada (s)": total_duration,
-            "Duração Efetiva (s)": effective_duration,
-            "Tempo no Canto (s)": self.corner_time,
-            "Porcentagem no Canto (%)": corner_percent,
-            "Tempo na Lateral (s)": self.lateral_time,
-            "Porcentagem na Lateral (%)": lateral_percent,
-            "Tempo no Centro (s)": self.center_time,
-            "Porcentagem no Centro (%)": center_percent,
-        }
-        
-        self.show_pie_chart()
-        self.page.update()
+        # Apenas as linhas alteradas são marcadas para atualização
+        self.report.render(self.report_sink)
+        self.updates.mark(*self.report_sink.take_updated())
+        
+        # O gráfico só é refeito se os tempos por área mudaram
+        chart_key = tuple(self.engine.zone_time_ns(zone) for zone in range(len(self.zones)))
+        if chart_key != self.chart_key:
+            self.chart_key = chart_key
+            self.show_pie_chart()
     
     def show_pie_chart(self):
-        labels = ['Canto', 'Lateral', 'Centro']
-        sizes = [self.corner_time, self.lateral_time, self.center_time]
-        colors = ['red', 'skyblue', 'forestgreen']
-        
-        filtered_data = [(label, size, color) for label, size, color in zip(labels, sizes, colors) if size > 0]
-        
-        if not filtered_data:
-            self.chart_container.content = ft.Text(
-                "Nenhum tempo registrado para exibir o gráfico.",
-                text_align=ft.TextAlign.CENTER
-            )
-            return
-        
-        filtered_labels, filtered_sizes, filtered_colors = zip(*filtered_data)
-        
-        fig, ax = plt.subplots(figsize=(6, 5))
-        wedges, texts, autotexts = ax.pie(
-            filtered_sizes,
-            labels=filtered_labels,
-            colors=filtered_colors,
-            autopct='%1.1f%%',
-            startangle=90,
-            pctdistance=0.85
-        )
-        
-        for autotext in autotexts:
-            autotext.set_color('black')
-            autotext.set_fontsize(10)
-        for text in texts:
-            text.set_fontsize(10)
-        
-        ax.axis('equal')
-        ax.set_title("Distribuição de Tempo por Área", fontsize=12, fontweight='bold')
-        
-        buffer = io.BytesIO()
-        plt.savefig(buffer, format='png', bbox_inches='tight', dpi=100)
-        buffer.seek(0)
-        image_data = base64.b64encode(buffer.getvalue()).decode()
-        plt.close()
-        
-        self.chart_container.content = ft.Image(
-            src_base64=image_data,
-            width=400,
-            height=300,
-            fit=ft.ImageFit.CONTAIN
-        )
+        # Gráfico nativo do Flet: criado uma vez, depois só os valores das fatias mudam
+        if self.pie_chart is None:
+            self.pie_chart = FletPieChart(self.zones)
+            self.chart_container.content = self.pie_chart.control
+            self.updates.mark(self.chart_container)
+        self.pie_chart.update([self.engine.zone_time_ns(zone) for zone in range(len(self.zones))])
+        self.updates.mark(self.pie_chart.control)
     
     def export_report(self, e):
         if not self.test_data:
@@ -454,8 +536,14 @@ class OpenFieldApp:
         
         try:
             with open(filename, 'w', encoding='utf-8') as file:
-                file.write(self.report_text.value)
-            self.show_snack_bar(f"Relatório exportado: {filename}", "#4CAF50")
+                file.write(self.report.text())
+            self.input_latency.dump(latency_path(filename))
+            # O gráfico em arquivo é gerado com Matplotlib apenas na exportação
+            sizes = [self.engine.zone_time_ns(zone) for zone in range(len(self.zones))]
+            if save_pie_png(filename[:-4] + ".png", self.zones, sizes):
+                self.show_snack_bar(f"Relatório exportado: {filename} (+ gráfico .png)", "#4CAF50")
+            else:
+                self.show_snack_bar(f"Relatório exportado: {filename}", "#4CAF50")
         except Exception as ex:
             self.show_snack_bar(f"Erro ao exportar: {ex}", "#F44336")
     
@@ -466,13 +554,27 @@ class OpenFieldApp:
         )
         self.page.snack_bar = snack_bar
         snack_bar.open = True
-        self.page.update()
+        self.updates.mark_page()
 
 
-def main(page: ft.Page):
+def main(page: ft.Page, zones=DEFAULT_ZONES, show_traffic=False, ticker=None):
     page.title = "Teste de Campo Aberto - Flet"
-    app = OpenFieldApp(page)
+    app = OpenFieldApp(page, zones=zones, show_traffic=show_traffic, ticker=ticker)
 
 
 if __name__ == "__main__":
-    ft.app(target=main)
+    parser = argparse.ArgumentParser(description="Teste de Campo Aberto - Flet")
+    parser.add_argument("--arena", choices=sorted(ARENAS), default="padrao",
+                        help="Configuração de áreas da arena (padrão: Canto/Lateral/Centro)")
+    parser.add_argument("--trafego", action="store_true",
+                        help="Mostra no terminal as mensagens e bytes enviados por segundo ao cliente")
+    parser.add_argument("--servidor", type=int, metavar="PORTA",
+                        help="Serve o app no navegador para várias estações, com um relógio compartilhado")
+    args = parser.parse_args()
+    
+    if args.servidor:
+        ticker = SharedTicker()
+        ft.app(target=lambda page: main(page, zones=ARENAS[args.arena], show_traffic=args.trafego, ticker=ticker),
+               view=ft.AppView.WEB_BROWSER, port=args.servidor)
+    else:
+        ft.app(target=lambda page: main(page, zones=ARENAS[args.arena], show_traffic=args.trafego))
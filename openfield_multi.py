@@ -0,0 +1,258 @@
+import argparse
+import math
+import os
+import time
+import tkinter as tk
+from tkinter import messagebox
+
+from clock import NS_PER_SECOND, EventClock, default_clock, to_seconds
+from journal import JOURNAL_DIR, SessionJournal, journal_path
+from metrics import BoutStats, OccupancyBins
+from report import ReportModel, TkTextSink, build_report
+from scoring import ScoringEngine
+from zones import ARENAS, DEFAULT_ZONES
+
+# Várias arenas na mesma janela (ex.: quatro arenas filmadas juntas).
+# Cada arena tem seu animal, duração, motor de pontuação, métricas e
+# relatório; um único `after` da janela atualiza todas as arenas em
+# andamento numa passada por quadro, em vez de uma cadeia de `after` por arena.
+# Os diários ficam num subdiretório próprio, fora da recuperação automática
+# do app de arena única (use openfield_batch.py/replay.py para reprocessá-los).
+
+TICK_MS = 200
+ARENA_JOURNAL_DIR = os.path.join(JOURNAL_DIR, "arenas")
+
+
+class ArenaPanel:
+    def __init__(self, master, number, zones, clock, event_clock):
+        self.number = number
+        self.zones = zones
+        self.event_clock = event_clock
+
+        self.engine = ScoringEngine(n_zones=len(zones), clock=clock)
+        self.journal = None
+        self.occupancy = OccupancyBins(len(zones))
+        self.engine.listeners.append(self.occupancy)
+        self.bout_stats = BoutStats(len(zones))
+        self.engine.listeners.append(self.bout_stats)
+
+        self.animal_id = tk.StringVar()
+        self.test_duration = tk.IntVar(value=300)
+        self.report = ReportModel()
+        self.report_window = None
+        self.report_sink = None
+        self.timer_text = ""
+        self.times_text = ""
+
+        self.frame = tk.LabelFrame(master, text=f"Arena {number}", padx=4, pady=4)
+        top = tk.Frame(self.frame)
+        top.pack(fill="x")
+        tk.Label(top, text="ID:").pack(side="left")
+        tk.Entry(top, textvariable=self.animal_id, width=8).pack(side="left")
+        tk.Label(top, text="s:").pack(side="left")
+        tk.Entry(top, textvariable=self.test_duration, width=5).pack(side="left")
+        self.start_button = tk.Button(top, text="Iniciar", command=self.start_test, bg="lightgreen")
+        self.start_button.pack(side="left", padx=2)
+        self.stop_button = tk.Button(top, text="Parar", command=self.stop_test, bg="salmon", state="disabled")
+        self.stop_button.pack(side="left")
+        tk.Button(top, text="Relatório", command=self.show_report).pack(side="left", padx=2)
+
+        self.timer_label = tk.Label(self.frame, text="Tempo Restante: 00:00", font=("Arial", 11))
+        self.timer_label.pack()
+
+        # Botões e rótulos das áreas, indexados pelo id da zona (como no app de arena única)
+        area_frame = tk.Frame(self.frame)
+        area_frame.pack(fill="x")
+        n_cols = max(zone.col + zone.colspan for zone in zones)
+        for col in range(n_cols):
+            area_frame.grid_columnconfigure(col, weight=1)
+        self.area_buttons = []
+        for zone_id, zone in enumerate(zones):
+            button = tk.Button(area_frame, text=zone.name, bg=zone.color, fg=zone.fg, height=1, state="disabled")
+            button.bind("<ButtonPress-1>", lambda event, z=zone_id: self._on_button_press(event, z))
+            button.bind("<ButtonRelease-1>", lambda event, z=zone_id: self._on_button_release(event, z))
+            button.grid(row=zone.row, column=zone.col, columnspan=zone.colspan, padx=1, pady=1, sticky="ew")
+            self.area_buttons.append(button)
+        self.times_label = tk.Label(self.frame, text="", font=("Arial", 9), justify="left")
+        self.times_label.pack(anchor="w")
+        self._update_times_label()
+
+    def start_test(self):
+        if self.engine.running:
+            return
+        animal_id = self.animal_id.get().strip()
+        if not animal_id:
+            messagebox.showwarning("Erro", f"Arena {self.number}: insira o ID do Animal.")
+            return
+        try:
+            duration = self.test_duration.get()
+            if duration <= 0:
+                raise ValueError
+        except (ValueError, tk.TclError):
+            messagebox.showwarning("Erro", f"Arena {self.number}: insira uma duração válida (número inteiro positivo).")
+            return
+
+        self._close_journal()
+        try:
+            self.journal = SessionJournal(journal_path(animal_id, ARENA_JOURNAL_DIR), animal_id)
+        except RuntimeError as e:
+            messagebox.showwarning("Erro", f"Arena {self.number}: {e}")
+            return
+        self.engine.listeners.append(self.journal)
+        self.engine.start(duration)
+
+        self.start_button.config(state="disabled")
+        self.stop_button.config(state="normal")
+        for button in self.area_buttons:
+            button.config(state="normal", relief="raised")
+        self._update_times_label()
+
+    def stop_test(self):
+        if not self.engine.running:
+            return
+        active_zone = self.engine.active_zone
+        self.engine.stop()
+        self._close_journal()
+        if active_zone is not None:
+            self._highlight_button(active_zone, False)
+
+        self.start_button.config(state="normal")
+        self.stop_button.config(state="disabled")
+        for button in self.area_buttons:
+            button.config(state="disabled")
+        self._update_times_label()
+        if self.report_window is not None:
+            self.refresh_report()
+
+    def _close_journal(self):
+        if self.journal is not None:
+            self.engine.listeners.remove(self.journal)
+            self.journal.close()
+            self.journal = None
+
+    def tick_ui(self):
+        # Um quadro da arena; retorna False quando o teste terminou.
+        # Os widgets só são reconfigurados quando o texto exibido muda
+        remaining_ns = self.engine.tick()
+        if self.engine.active_zone is not None:
+            self._update_times_label()
+        if remaining_ns <= 0:
+            self._set_timer_text("Tempo Restante: 00:00")
+            self.stop_test()
+            return False
+        mins, secs = divmod(remaining_ns // NS_PER_SECOND, 60)
+        self._set_timer_text(f"Tempo Restante: {mins:02d}:{secs:02d}")
+        return True
+
+    def _set_timer_text(self, text):
+        if text != self.timer_text:
+            self.timer_text = text
+            self.timer_label.config(text=text)
+
+    def _update_times_label(self):
+        # Um único rótulo com o tempo de todas as áreas da arena
+        text = "  ".join(f"{zone.name}: {to_seconds(self.engine.zone_time_ns(zone_id)):.1f} s"
+                         for zone_id, zone in enumerate(self.zones))
+        if text != self.times_text:
+            self.times_text = text
+            self.times_label.config(text=text)
+
+    def _on_button_press(self, event, zone):
+        if not self.engine.running or zone == self.engine.active_zone:
+            return
+        previous = self.engine.enter(zone, self.event_clock.to_clock(event.time))
+        if previous is not None:
+            self._highlight_button(previous, False)
+        self._highlight_button(zone, True)
+        self._update_times_label()
+
+    def _on_button_release(self, event, zone):
+        if not self.engine.running:
+            return
+        if self.engine.exit(zone, self.event_clock.to_clock(event.time)):
+            self._highlight_button(zone, False)
+            self._update_times_label()
+
+    def _highlight_button(self, zone, is_pressed):
+        button = self.area_buttons[zone]
+        if is_pressed:
+            button.config(relief="sunken", bg="darkgray")
+        else:
+            button.config(relief="raised", bg=self.zones[zone].color)
+
+    def show_report(self):
+        if self.engine.start_time is None:
+            messagebox.showinfo("Aviso", f"Arena {self.number}: inicie um teste primeiro para gerar o relatório.")
+            return
+        # Janela do relatório criada no primeiro uso e reaproveitada
+        if self.report_window is None:
+            self.report_window = tk.Toplevel(self.frame)
+            self.report_window.title(f"Relatório - Arena {self.number}")
+            self.report_window.protocol("WM_DELETE_WINDOW", self._close_report)
+            text = tk.Text(self.report_window, width=80, height=30, state="disabled", wrap="word")
+            text.pack(fill="both", expand=True)
+            tk.Button(self.report_window, text="Exportar Relatório (TXT)", command=self.export_report).pack(pady=4)
+            self.report_sink = TkTextSink(text)
+            self.report = ReportModel() # Widget novo: o relatório é enviado inteiro
+        self.refresh_report()
+        self.report_window.lift()
+
+    def _close_report(self):
+        self.report_window.destroy()
+        self.report_window = None
+        self.report_sink = None
+
+    def refresh_report(self):
+        build_report(self.report, self.engine, self.zones, self.occupancy, self.bout_stats, self.animal_id.get(),
+                     title=f"--- Relatório do Teste Open Field - Arena {self.number} ---")
+        self.report.render(self.report_sink)
+
+    def export_report(self):
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
+        filename = f"relatorio_openfield_arena{self.number}_{self.animal_id.get().strip()}_{timestamp}.txt"
+        try:
+            with open(filename, "w", encoding="utf-8") as file:
+                file.write(self.report.text())
+            messagebox.showinfo("Exportação Concluída", f"Relatório exportado com sucesso para:\n{filename}")
+        except Exception as e:
+            messagebox.showerror("Erro na Exportação", f"Ocorreu um erro ao exportar o relatório: {e}")
+
+
+class MultiArenaApp:
+    def __init__(self, master, n_arenas=4, zones=DEFAULT_ZONES, clock=default_clock):
+        self.master = master
+        master.title(f"Teste de Campo Aberto - {n_arenas} Arenas")
+
+        # Um único conversor de carimbos de evento: todas as arenas recebem
+        # eventos do mesmo servidor gráfico
+        self.event_clock = EventClock(clock)
+
+        n_cols = math.ceil(math.sqrt(n_arenas))
+        for col in range(n_cols):
+            master.grid_columnconfigure(col, weight=1)
+        self.panels = []
+        for index in range(n_arenas):
+            panel = ArenaPanel(master, index + 1, zones, clock, self.event_clock)
+            panel.frame.grid(row=index // n_cols, column=index % n_cols, padx=4, pady=4, sticky="nsew")
+            self.panels.append(panel)
+
+        self._tick()
+
+    def _tick(self):
+        # Passada única pelas arenas em andamento; as paradas custam só a checagem
+        for panel in self.panels:
+            if panel.engine.running:
+                panel.tick_ui()
+        self.master.after(TICK_MS, self._tick)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Teste de Campo Aberto - várias arenas na mesma janela")
+    parser.add_argument("-n", "--arenas", type=int, default=4, help="Número de arenas (ex.: 4, 9, 16)")
+    parser.add_argument("--arena", choices=sorted(ARENAS), default="padrao",
+                        help="Configuração de áreas de cada arena (padrão: Canto/Lateral/Centro)")
+    args = parser.parse_args()
+
+    root = tk.Tk()
+    app = MultiArenaApp(root, n_arenas=args.arenas, zones=ARENAS[args.arena])
+    root.mainloop()
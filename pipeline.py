@@ -0,0 +1,118 @@
+import queue
+import threading
+
+from clock import default_clock
+from metrics import LogHistogram
+
+# Processamento em fluxo com uma thread por etapa.
+# As etapas são ligadas por filas limitadas: enquanto uma etapa trabalha no
+# item seguinte a anterior já produz o próximo (a decodificação do vídeo e o
+# NumPy liberam o GIL), e uma etapa rápida espera a lenta em vez de acumular
+# itens, então a memória fica limitada a algumas filas cheias mesmo em
+# gravações de horas. Cada etapa mede sua vazão (itens por segundo de
+# trabalho, sem contar a espera nas filas) e a ocupação da fila de entrada.
+
+QUEUE_SIZE = 8
+_DONE = object()  # Fim do fluxo, passado adiante por todas as etapas
+
+
+class Stage:
+    # `process(item)` retorna os itens produzidos (zero ou mais) e
+    # `finish()`, chamado no fim do fluxo, os que ainda estavam retidos
+    def __init__(self, name, process, finish=None, clock=default_clock):
+        self.name = name
+        self.process = process
+        self.finish = finish
+        self.clock = clock
+        self.items_in = 0
+        self.items_out = 0
+        self.busy_ns = 0
+        self.depth = LogHistogram()  # Itens na fila de entrada a cada retirada
+
+    def summary(self):
+        rate = self.items_in / (self.busy_ns / 1e9) if self.busy_ns else 0
+        line = f"{self.name}: {self.items_in} itens, {rate:.0f} itens/s"
+        if self.depth.count:
+            line += f", fila média {self.depth.mean():.1f} / máx {self.depth.max}"
+        return line
+
+
+class Pipeline:
+    def __init__(self, source, stages, source_name="fonte", queue_size=QUEUE_SIZE, clock=default_clock):
+        # `source` é um iterável (ex.: os quadros do vídeo) percorrido na
+        # thread própria de uma etapa de nome `source_name`
+        self.source = Stage(source_name, None, clock=clock)
+        self.source_items = source
+        self.stages = stages
+        self.clock = clock
+        self.queues = [queue.Queue(queue_size) for _ in stages]
+        self.output = queue.Queue(queue_size)
+        self.error = None
+        self.threads = []
+
+    def __iter__(self):
+        # Inicia as threads e entrega os itens da última etapa, em ordem
+        outputs = self.queues[1:] + [self.output]
+        self.threads = [threading.Thread(target=self._run_source, args=(self.queues[0],), daemon=True)]
+        self.threads += [threading.Thread(target=self._run_stage, args=(stage, inbox, outbox), daemon=True)
+                         for stage, inbox, outbox in zip(self.stages, self.queues, outputs)]
+        for thread in self.threads:
+            thread.start()
+        while True:
+            item = self.output.get()
+            if item is _DONE:
+                break
+            yield item
+        for thread in self.threads:
+            thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def _run_source(self, outbox):
+        stage = self.source
+        items = iter(self.source_items)
+        try:
+            while True:
+                start = self.clock()
+                item = next(items, _DONE)
+                stage.busy_ns += self.clock() - start
+                if item is _DONE:
+                    break
+                stage.items_in += 1
+                stage.items_out += 1
+                outbox.put(item)
+        except Exception as error:
+            self.error = error
+        outbox.put(_DONE)
+
+    def _run_stage(self, stage, inbox, outbox):
+        failed = False
+        while True:
+            stage.depth.record(inbox.qsize())
+            item = inbox.get()
+            if item is _DONE:
+                break
+            if failed:
+                continue  # Esvazia a fila para a etapa anterior não travar
+            try:
+                start = self.clock()
+                results = stage.process(item)
+                stage.busy_ns += self.clock() - start
+                stage.items_in += 1
+                for result in results:
+                    stage.items_out += 1
+                    outbox.put(result)
+            except Exception as error:
+                self.error = error
+                failed = True
+        if stage.finish is not None and not failed:
+            try:
+                for result in stage.finish():
+                    stage.items_out += 1
+                    outbox.put(result)
+            except Exception as error:
+                self.error = error
+        outbox.put(_DONE)
+
+    def summary(self):
+        return [stage.summary() for stage in [self.source] + self.stages]
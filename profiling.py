@@ -0,0 +1,122 @@
+import cProfile
+import io
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+
+# Perfil de uma sessão de teste (opcional, ativado na interface).
+# Entre start_test e stop_test o cProfile mede o tempo por função e o
+# tracemalloc registra onde a memória é alocada; ao parar, as estatísticas
+# são gravadas ao lado do relatório para diagnosticar queixas de lentidão
+# depois do fato. A partir do Python 3.12 o cProfile usa sys.monitoring e
+# mede todas as threads de uma vez; antes disso mede só a thread que o ligou,
+# então no Flet (handlers em threads do executor) cada handler é medido com
+# runcall na thread em que roda, e os perfis das threads são somados no final.
+
+PROFILES_ALL_THREADS = sys.version_info >= (3, 12)
+TRACEMALLOC_FRAMES = 10
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 25
+
+
+def profile_base(animal_id):
+    # Nome-base dos arquivos de perfil: o mesmo dos relatórios exportados, com
+    # o ID do animal reduzido a caracteres válidos em nome de arquivo
+    safe_id = re.sub(r"[^\w.-]", "_", animal_id.strip())
+    return f"relatorio_openfield_{safe_id}_{time.strftime('%Y%m%d_%H%M%S')}"
+
+
+class SessionProfiler:
+    def __init__(self):
+        self.active = False
+        self.profiles = []
+        self.snapshot = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._enabled = None
+
+    def start(self, ui_thread=True):
+        # `ui_thread`: a thread que chama start (e depois stop) é a da interface,
+        # e fica medida continuamente (Tkinter). Gera ValueError se outra
+        # ferramenta de perfil (ex.: um depurador) já estiver ativa
+        self.profiles = []
+        self.snapshot = None
+        self._local = threading.local()
+        if ui_thread or PROFILES_ALL_THREADS:
+            profile = self._thread_profile()
+            profile.enable()
+            self._enabled = profile
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+        self.active = True
+
+    def runcall(self, func, *args):
+        # Mede uma chamada na thread atual (se ela já não estiver sendo medida);
+        # chamadas aninhadas entram na de fora
+        if not self.active or PROFILES_ALL_THREADS or getattr(self._local, "depth", 0):
+            return func(*args)
+        profile = self._thread_profile()
+        self._local.depth = 1
+        try:
+            return profile.runcall(func, *args)
+        finally:
+            self._local.depth = 0
+
+    def _thread_profile(self):
+        profile = getattr(self._local, "profile", None)
+        if profile is None:
+            profile = cProfile.Profile()
+            self._local.profile = profile
+            with self._lock:
+                self.profiles.append(profile)
+        return profile
+
+    def stop(self):
+        if not self.active:
+            return
+        self.active = False
+        if self._enabled is not None:
+            self._enabled.disable()
+            self._enabled = None
+        self.snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+        tracemalloc.stop()
+
+    def write(self, base_path):
+        # Grava <base>_perfil.prof (para pstats/snakeviz) e <base>_perfil.txt
+        # (funções mais caras e principais pontos de alocação). Retorna os caminhos
+        with self._lock:
+            profiles = list(self.profiles)
+        prof_path = f"{base_path}_perfil.prof"
+        text_path = f"{base_path}_perfil.txt"
+
+        text = io.StringIO()
+        measured = [profile for profile in profiles if _has_stats(profile)]
+        if measured:
+            stats = pstats.Stats(*measured, stream=text)
+            stats.dump_stats(prof_path)
+            text.write("--- Funções por tempo acumulado ---\n")
+            stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        else:
+            prof_path = None
+            text.write("Nenhuma chamada medida.\n")
+
+        if self.snapshot is not None:
+            text.write("\n--- Principais pontos de alocação (tracemalloc) ---\n")
+            for index, stat in enumerate(self.snapshot.statistics("lineno")[:TOP_ALLOCATIONS], 1):
+                frame = stat.traceback[0]
+                text.write(f"{index:3d}. {frame.filename}:{frame.lineno}: "
+                           f"{stat.size / 1024:.1f} KiB em {stat.count} blocos\n")
+
+        with open(text_path, "w", encoding="utf-8") as file:
+            file.write(text.getvalue())
+        return [path for path in (text_path, prof_path) if path]
+
+
+def _has_stats(profile):
+    profile.create_stats()
+    return bool(profile.stats)
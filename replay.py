@@ -0,0 +1,257 @@
+import argparse
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from clock import NS_PER_SECOND, FakeClock
+from journal import ENTER, EXIT, RECORD, START, STOP
+from scoring import ScoringEngine
+from zones import DEFAULT_ZONES, arena_for
+
+# Reprocessamento vetorizado de sessões gravadas.
+# Recalcula a partir dos eventos tudo o que generate_report apresenta
+# (tempos, porcentagens e duração efetiva) com operações de array, sem
+# repetir a lógica evento a evento do motor. As contas são feitas na mesma
+# ordem e com os mesmos tipos do app (ns inteiros, divisão em float64), então
+# os resultados são idênticos bit a bit aos do relatório ao vivo. As
+# permanências são pareadas com as mesmas regras da recuperação
+# (journal.pair_events).
+
+RECORD_DTYPE = np.dtype([
+    ("kind", "u1"),
+    ("zone", "u1"),
+    ("id_length", "<u2"),
+    ("arg", "<u4"),
+    ("t", "<i8"),
+])
+assert RECORD_DTYPE.itemsize == RECORD.size
+
+ReplayResult = namedtuple("ReplayResult", [
+    "animal_id",
+    "duration",               # Duração programada (s)
+    "effective_duration_ns",
+    "zone_times_ns",          # Array int64 indexado pelo id da zona
+    "effective_duration",     # Segundos
+    "zone_times",             # Segundos
+    "zone_percents",
+])
+
+
+def load_events(path):
+    # Lê o diário direto para um array estruturado (sem laço em Python)
+    with open(path, "rb") as file:
+        data = file.read()
+    header = np.frombuffer(data, RECORD_DTYPE, count=1)[0]
+    if header["kind"] != START:
+        raise ValueError(f"{path}: diário sem registro START")
+    offset = RECORD.size + int(header["id_length"])
+    animal_id = data[RECORD.size:offset].decode("utf-8", errors="replace")
+    count = (len(data) - offset) // RECORD.size
+    events = np.frombuffer(data, RECORD_DTYPE, count=count, offset=offset)
+    return animal_id, int(header["arg"]), int(header["zone"]), events
+
+
+def bouts_from_events(kinds, zones, times):
+    # Cada ENTER é encerrada pelo registro de área seguinte: numa EXIT, no
+    # instante dela; numa nova ENTER (saída não registrada), no último instante
+    # registrado antes dela; sem registro seguinte (sessão interrompida), no
+    # último instante do diário. Saídas sem entrada antes delas são ignoradas
+    positions = np.flatnonzero((kinds == ENTER) | (kinds == EXIT))
+    area_kinds = kinds[positions]
+    enters = np.flatnonzero(area_kinds == ENTER)
+    if not len(enters):
+        return zones[:0], np.zeros(0, dtype=np.int64)
+    latest = np.maximum.accumulate(times)  # Último instante registrado até cada posição
+
+    following = enters + 1
+    has_next = following < len(positions)
+    next_positions = positions[np.minimum(following, len(positions) - 1)]
+    closes = np.where(area_kinds[np.minimum(following, len(positions) - 1)] == EXIT,
+                      times[next_positions], latest[next_positions - 1])
+    closes = np.where(has_next, closes, latest[-1])
+
+    enter_positions = positions[enters]
+    return zones[enter_positions], closes - times[enter_positions]
+
+
+def replay(bout_zones, durations_ns, effective_duration_ns, n_zones=len(DEFAULT_ZONES),
+           animal_id="", duration=0):
+    # Totais por zona: somas de inteiros em float64 são exatas abaixo de 2**53 ns (~104 dias)
+    zone_times_ns = np.bincount(bout_zones, weights=durations_ns, minlength=n_zones).astype(np.int64)
+
+    # Mesma proteção contra divisão por zero do relatório ao vivo
+    if effective_duration_ns <= 0:
+        effective_duration_ns = 1_000_000
+
+    zone_percents = (zone_times_ns / effective_duration_ns) * 100
+    return ReplayResult(
+        animal_id=animal_id,
+        duration=duration,
+        effective_duration_ns=effective_duration_ns,
+        zone_times_ns=zone_times_ns,
+        effective_duration=effective_duration_ns / NS_PER_SECOND,
+        zone_times=zone_times_ns / NS_PER_SECOND,
+        zone_percents=zone_percents,
+    )
+
+
+def replay_journal(path):
+    animal_id, duration, n_zones, events = load_events(path)
+    kinds = events["kind"]
+    times = events["t"]
+    bout_zones, durations_ns = bouts_from_events(kinds, events["zone"], times)
+
+    # Duração efetiva: instante do STOP (já limitado à duração programada) ou,
+    # numa sessão interrompida, o último instante registrado
+    stops = times[kinds == STOP]
+    if len(stops):
+        effective_duration_ns = int(stops[-1])
+    else:
+        effective_duration_ns = min(int(times.max()) if len(times) else 0, duration * NS_PER_SECOND)
+    return replay(bout_zones, durations_ns, effective_duration_ns, n_zones, animal_id, duration)
+
+
+def to_test_data(result, zones=DEFAULT_ZONES):
+    # Mesmas chaves de test_data usadas pelos apps
+    test_data = {
+        "ID do Animal": result.animal_id,
+        "Duração Programada (s)": result.duration,
+        "Duração Efetiva (s)": float(result.effective_duration),
+    }
+    for zone, zone_time, zone_percent in zip(zones, result.zone_times, result.zone_percents):
+        test_data[f"Tempo {zone.article} {zone.name} (s)"] = float(zone_time)
+        test_data[f"Porcentagem {zone.article} {zone.name} (%)"] = float(zone_percent)
+    return test_data
+
+
+def benchmark(n_events, n_zones=len(DEFAULT_ZONES), repeat=5):
+    # Fluxo sintético de entradas/saídas alternadas com permanências aleatórias
+    rng = np.random.default_rng(0)
+    n_events -= n_events % 2
+    times = np.cumsum(rng.integers(1_000_000, 5_000_000_000, n_events, dtype=np.int64))
+    kinds = np.tile(np.array([ENTER, EXIT], dtype=np.uint8), n_events // 2)
+    zones = np.repeat(rng.integers(0, n_zones, n_events // 2, dtype=np.uint8), 2)
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        bout_zones, durations_ns = bouts_from_events(kinds, zones, times)
+        replay(bout_zones, durations_ns, int(times[-1]), n_zones)
+        best = min(best, time.perf_counter() - start)
+    return n_events / best
+
+
+def verify_pairing(n_sessions=200, seed=0):
+    # Fluxos aleatórios de ENTER/EXIT/TICK com saídas faltando: o pareamento
+    # vetorizado deve dar as mesmas permanências da recuperação evento a evento
+    from journal import TICK, pair_events
+
+    rng = np.random.default_rng(seed)
+    problems = []
+    for session in range(n_sessions):
+        n_records = int(rng.integers(1, 60))
+        times = np.cumsum(rng.integers(0, 3_000_000_000, n_records, dtype=np.int64))
+        zones = rng.integers(0, len(DEFAULT_ZONES), n_records).astype(np.uint8)
+        kinds = np.empty(n_records, dtype=np.uint8)
+        active = None
+        for index in range(n_records):
+            roll = rng.random()
+            if roll < 0.2:
+                kinds[index] = TICK
+            elif active is not None and roll < 0.8:
+                kinds[index] = EXIT  # Às vezes falta: a próxima ENTER vem direto
+                zones[index] = active
+                active = None
+            else:
+                kinds[index] = ENTER
+                active = int(zones[index])
+        expected, _ = pair_events(zip(kinds.tolist(), zones.tolist(), times.tolist()))
+        bout_zones, durations = bouts_from_events(kinds, zones, times)
+        got = list(zip(bout_zones.tolist(), durations.tolist()))
+        if got != [(zone, exit - enter) for zone, enter, exit in expected]:
+            problems.append(f"pareamento divergente na sessão aleatória {session}")
+    return problems
+
+
+def verify_recovery():
+    # Sessão com duas quedas (cada uma com uma área pressionada), recuperada do
+    # diário e terminada; a reprodução do diário deve dar os mesmos tempos do
+    # motor. Retorna a lista de divergências (vazia se tudo confere)
+    from journal import SessionJournal, journal_path, read_journal, recover_session
+
+    directory = tempfile.mkdtemp(prefix="openfield_verificacao_")
+    clock = FakeClock()
+    wall_start = []
+
+    def wall_clock():
+        return wall_start[0] + clock.now_ns
+
+    def crash(engine, journal):
+        # Um tick deixa um ponto de verificação; o diário é fechado sem STOP
+        clock.advance(1)
+        engine.tick()
+        journal.close()
+
+    engine = ScoringEngine(clock=clock)
+    journal = SessionJournal(journal_path("verificacao", directory), "verificacao")
+    engine.listeners.append(journal)
+    engine.start(60)
+    journal.sync()
+    wall_start.append(read_journal(journal.path).wall_start_ns)
+    for zone, seconds in ((0, 2), (1, 1)):
+        engine.enter(zone)
+        clock.advance(seconds)
+    crash(engine, journal)
+
+    for zones in (((2, 2), (0, 1)), ((1, 3),)):
+        clock.advance(5)  # Programa fechado: o teste continua correndo
+        engine = ScoringEngine(clock=clock)
+        _, journal = recover_session(engine, directory, wall_clock)
+        engine.listeners.append(journal)
+        for zone, seconds in zones:
+            engine.enter(zone)
+            clock.advance(seconds)
+        crash(engine, journal)
+
+    engine = ScoringEngine(clock=clock)
+    _, journal = recover_session(engine, directory, wall_clock)
+    engine.listeners.append(journal)
+    engine.stop()
+    journal.close()
+
+    result = replay_journal(journal.path)
+    problems = []
+    if result.zone_times_ns.tolist() != engine.totals:
+        problems.append(f"tempos por área: reprodução {result.zone_times_ns.tolist()} != motor {engine.totals}")
+    if result.effective_duration_ns != engine.effective_duration_ns():
+        problems.append(f"duração efetiva: reprodução {result.effective_duration_ns} != "
+                        f"motor {engine.effective_duration_ns()}")
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recalcula relatórios a partir dos diários de sessão")
+    parser.add_argument("journals", nargs="*", help="Arquivos de diário (.ofj)")
+    parser.add_argument("--bench", type=int, metavar="N", help="Mede a vazão com N eventos sintéticos")
+    parser.add_argument("--verificar", action="store_true",
+                        help="Confere que a reprodução de um diário recuperado após quedas bate com o motor")
+    args = parser.parse_args()
+
+    if args.verificar:
+        problems = verify_recovery() + verify_pairing()
+        for problem in problems:
+            print(problem)
+        print("Reprodução após recuperação: " + ("DIVERGE" if problems else "ok"))
+        if problems:
+            sys.exit(1)
+
+    if args.bench:
+        print(f"{benchmark(args.bench) / 1e6:.1f} milhões de eventos/s")
+    for path in args.journals:
+        result = replay_journal(path)
+        for key, value in to_test_data(result, arena_for(len(result.zone_times_ns))).items():
+            print(f"{key}: {value}")
+        print()
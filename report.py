@@ -0,0 +1,249 @@
+import time
+
+from clock import to_seconds
+from latency import KIND_NAMES
+from metrics import bout_test_data
+from zones import CENTER
+
+# Modelo do relatório com rastreamento de alterações.
+# O relatório é uma sequência de linhas identificadas por chave; cada linha
+# guarda os valores brutos que a geraram e só é reformatada quando esses
+# valores mudam. Na renderização apenas as linhas alteradas são enviadas ao
+# widget, e o texto inteiro só é refeito quando a estrutura muda (ex.: um
+# novo intervalo de ocupação).
+
+_MISSING = object()
+REPORT_TITLE = "--- Relatório do Teste Open Field ---"
+
+
+class ReportModel:
+    def __init__(self):
+        self.keys = []       # Ordem das linhas na última montagem
+        self.index = {}      # Chave -> posição da linha
+        self.values = {}     # Valores brutos de cada linha
+        self.texts = {}      # Texto formatado de cada linha
+        self.dirty = set()
+        self.layout_changed = True
+        self._order = []
+
+    def begin(self):
+        self._order = []
+
+    def line(self, key, fmt, *values):
+        # `fmt` é uma string de formatação (str.format) ou uma função dos valores
+        self._order.append(key)
+        if self.values.get(key, _MISSING) != values:
+            self.values[key] = values
+            self.texts[key] = fmt(*values) if callable(fmt) else fmt.format(*values)
+            self.dirty.add(key)
+
+    def end(self):
+        if self._order != self.keys:
+            self.keys = self._order
+            self.index = {key: position for position, key in enumerate(self.keys)}
+            self.layout_changed = True
+
+    def changed(self):
+        return self.layout_changed or bool(self.dirty)
+
+    def render(self, sink):
+        # Envia ao widget apenas o necessário; retorna o número de linhas enviadas
+        if self.layout_changed:
+            sink.replace_all([self.texts[key] for key in self.keys])
+            pushed = len(self.keys)
+        else:
+            for key in self.dirty:
+                sink.replace_line(self.index[key], self.texts[key])
+            pushed = len(self.dirty)
+        self.dirty.clear()
+        self.layout_changed = False
+        return pushed
+
+    def text(self):
+        return "\n".join(self.texts[key] for key in self.keys) + "\n"
+
+
+class TkTextSink:
+    # Destino de renderização para um tk.Text (linhas numeradas a partir de 1)
+    def __init__(self, widget):
+        self.widget = widget
+
+    def replace_all(self, lines):
+        self.widget.config(state="normal")
+        self.widget.delete("1.0", "end")
+        self.widget.insert("end", "\n".join(lines) + "\n")
+        self.widget.config(state="disabled")
+
+    def replace_line(self, index, text):
+        line = index + 1
+        self.widget.config(state="normal")
+        self.widget.delete(f"{line}.0", f"{line}.end")
+        self.widget.insert(f"{line}.0", text)
+        self.widget.config(state="disabled")
+
+
+class ControlListSink:
+    # Destino de renderização para uma coluna de controles de texto (Flet):
+    # uma linha por controle, e apenas os controles alterados são atualizados
+    def __init__(self, column, make_text):
+        self.column = column
+        self.make_text = make_text
+        self.updated = []
+
+    def replace_all(self, lines):
+        self.column.controls = [self.make_text(text) for text in lines]
+        self.updated = [self.column]
+
+    def replace_line(self, index, text):
+        control = self.column.controls[index]
+        control.value = text
+        self.updated.append(control)
+
+    def take_updated(self):
+        updated, self.updated = self.updated, []
+        return updated
+
+
+def _occupancy_header(zones):
+    return "  Intervalo    " + "".join(f"{zone.name:>10}" for zone in zones)
+
+
+def _occupancy_row(index, bin_seconds, *row):
+    interval = f"{index * bin_seconds}-{(index + 1) * bin_seconds} s"
+    return f"  {interval:<13}" + "".join(f"{to_seconds(value):>10.2f}" for value in row)
+
+
+def add_occupancy_lines(report, zones, table_ns, bin_seconds):
+    report.line("bins_title", "Ocupação por Intervalo ({} s):", bin_seconds)
+    report.line("bins_header", _occupancy_header, zones)
+    for index, row in enumerate(table_ns):
+        report.line(("bin", index), _occupancy_row, index, bin_seconds, *row)
+
+
+def _bout_line(name, entries, first_entry, mean, median, maximum):
+    latency = f"{to_seconds(first_entry):.2f} s" if first_entry is not None else "-"
+    return (f"  {name}: {entries} entradas, latência {latency}, "
+            f"média {to_seconds(mean):.2f} s, mediana {to_seconds(median):.2f} s, "
+            f"máx {to_seconds(maximum):.2f} s")
+
+
+def add_bout_lines(report, zones, stats):
+    report.line("bouts_title", "Entradas e Permanências:")
+    for zone_id, zone in enumerate(zones):
+        durations = stats.durations[zone_id]
+        report.line(("bout", zone_id), _bout_line, zone.name, stats.entries[zone_id],
+                    stats.first_entry[zone_id], durations.mean(), durations.quantile(0.5),
+                    durations.max or 0)
+
+
+def _locomotion_row(index, bin_seconds, distance, immobile):
+    interval = f"{index * bin_seconds}-{(index + 1) * bin_seconds} s"
+    return f"  {interval:<13}{distance:>15.1f}{immobile:>12.2f}"
+
+
+def add_locomotion_lines(report, zones, result):
+    report.line("locomotion_title", "Locomoção:")
+    report.line("distance", "  Distância Percorrida: {:.1f} cm", result.distance)
+    report.line("speed", "  Velocidade Média: {:.2f} cm/s", result.mean_speed)
+    report.line("immobile", "  Tempo Imóvel: {:.2f} segundos ({:.2f}%)", result.immobile,
+                result.immobile / result.duration * 100 if result.duration else 0.0)
+    for zone_id, zone in enumerate(zones):
+        report.line(("locomotion", zone_id), "  {}: {:.1f} cm, {:.2f} cm/s, imóvel {:.2f} s", zone.name,
+                    float(result.zone_distance[zone_id]), float(result.zone_speed[zone_id]),
+                    float(result.zone_immobile[zone_id]))
+    report.line("locomotion_bins_title", "Locomoção por Intervalo ({} s):", result.bin_seconds)
+    report.line("locomotion_bins_header", "  Intervalo     Distância (cm)  Imóvel (s)")
+    for index, (distance, immobile) in enumerate(zip(result.bin_distance.tolist(), result.bin_immobile.tolist())):
+        report.line(("locomotion_bin", index), _locomotion_row, index, result.bin_seconds, distance, immobile)
+
+
+def _percentiles(histogram):
+    if not histogram.count:
+        return None
+    return histogram.quantile(0.5), histogram.quantile(0.99)
+
+
+def _percentiles_text(percentiles):
+    if percentiles is None:
+        return "-"
+    p50, p99 = percentiles
+    return f"{p50 / 1e6:.2f} / {p99 / 1e6:.2f} ms"
+
+
+def _latency_line(name, delay, handler):
+    return f"  {name}: espera {_percentiles_text(delay)}, handler {_percentiles_text(handler)}"
+
+
+def add_latency_lines(report, latency):
+    report.line("latency_title", "Latência de Entrada (p50 / p99):")
+    for kind, name in KIND_NAMES.items():
+        report.line(("latency", kind), _latency_line, name,
+                    _percentiles(latency.delay[kind]), _percentiles(latency.handler[kind]))
+
+
+def build_report(report, engine, zones, occupancy, bout_stats, animal_id, title=REPORT_TITLE,
+                 latency=None, extra=None):
+    # Relatório da sessão, comum a todas as interfaces: durações, tempo por
+    # área, ocupação por intervalo, permanências e, se houver, a latência de
+    # entrada. `extra(report)` acrescenta linhas próprias da interface logo
+    # depois das áreas. Retorna o test_data usado no gráfico e na exportação
+    total_duration = engine.duration
+    # Duração efetiva: tempo decorrido até agora (teste em andamento) ou até a parada
+    effective_duration_ns = engine.effective_duration_ns()
+    if effective_duration_ns <= 0:
+        effective_duration_ns = 1_000_000  # Evita divisão por zero num teste sem duração relevante
+
+    zone_times_ns = [engine.zone_time_ns(zone) for zone in range(len(zones))]
+    zone_percents = [(time_ns / effective_duration_ns) * 100 for time_ns in zone_times_ns]
+
+    # Conversão para segundos apenas na geração do relatório
+    effective_duration = to_seconds(effective_duration_ns)
+    zone_times = [to_seconds(time_ns) for time_ns in zone_times_ns]
+
+    # Ocupação por intervalo e estatísticas de permanência (já acumuladas durante o teste)
+    now = engine.clock() if engine.running else None
+    bins_ns = occupancy.table_ns(effective_duration_ns, now)
+    center_latency_ns = bout_stats.latency_ns(zones, CENTER)
+    center_latency = to_seconds(center_latency_ns) if center_latency_ns is not None else None
+    center_latency_text = f"{center_latency:.2f} segundos" if center_latency is not None else "-"
+    timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
+
+    # Só as linhas cujos valores mudaram são reformatadas
+    report.begin()
+    report.line("title", "{}", title)
+    report.line(("blank", 0), "")
+    report.line("id", "ID do Animal: {}", animal_id)
+    report.line("date", "Data/Hora: {}", timestamp)
+    report.line("duration", "Duração Programada do Teste: {} segundos", total_duration)
+    report.line("effective", "Duração Efetiva do Teste: {:.2f} segundos", effective_duration)
+    report.line(("blank", 1), "")
+    report.line("areas_title", "Tempo Acumulado nas Áreas:")
+    for zone_id, zone in enumerate(zones):
+        report.line(("area", zone_id), "  {}: {:.2f} segundos ({:.2f}%)", zone.name, zone_times[zone_id], zone_percents[zone_id])
+    if extra is not None:
+        report.line(("blank", "extra"), "")
+        extra(report)
+    report.line(("blank", 2), "")
+    add_occupancy_lines(report, zones, bins_ns, occupancy.bin_seconds)
+    report.line(("blank", 3), "")
+    report.line("center_latency", "Latência até a 1ª Entrada no Centro: {}", center_latency_text)
+    add_bout_lines(report, zones, bout_stats)
+    if latency is not None:
+        report.line(("blank", 4), "")
+        add_latency_lines(report, latency)
+    report.end()
+
+    test_data = {
+        "ID do Animal": animal_id,
+        "Data/Hora": timestamp,
+        "Duração Programada (s)": total_duration,
+        "Duração Efetiva (s)": effective_duration,
+    }
+    for zone, zone_time, zone_percent in zip(zones, zone_times, zone_percents):
+        test_data[f"Tempo {zone.article} {zone.name} (s)"] = zone_time
+        test_data[f"Porcentagem {zone.article} {zone.name} (%)"] = zone_percent
+    test_data["Intervalo de Análise (s)"] = occupancy.bin_seconds
+    test_data["Ocupação por Intervalo (s)"] = [[to_seconds(value) for value in row] for row in bins_ns]
+    test_data["Latência até o Centro (s)"] = center_latency
+    test_data.update(bout_test_data(zones, bout_stats))
+    return test_data
@@ -0,0 +1,211 @@
+from array import array
+
+from clock import NS_PER_SECOND, default_clock
+from zones import DEFAULT_ZONES
+
+# Motor de pontuação independente de interface gráfica.
+# As duas versões (Tkinter e Flet) apenas traduzem eventos de botão em
+# chamadas enter/exit/tick; toda a contabilidade de tempo acontece aqui.
+# Todos os instantes e durações são nanossegundos inteiros do relógio
+# monotônico injetado; a conversão para segundos fica para a exibição.
+# As zonas são identificadas pelo seu índice na tabela de `zones.py`.
+
+
+class BoutLog:
+    # Registro das permanências (bouts) em arrays paralelos: zona, entrada, saída
+    def __init__(self):
+        self.zones = array("b")
+        self.enters = array("q")
+        self.exits = array("q")
+
+    def append(self, zone, enter, exit):
+        self.zones.append(zone)
+        self.enters.append(enter)
+        self.exits.append(exit)
+
+    def clear(self):
+        del self.zones[:]
+        del self.enters[:]
+        del self.exits[:]
+
+    def __len__(self):
+        return len(self.zones)
+
+    def __iter__(self):
+        return zip(self.zones, self.enters, self.exits)
+
+
+class EngineListener:
+    # Interface para quem acompanha a sessão (diário, métricas, etc.).
+    # Os instantes recebidos são ns do relógio do motor
+    def on_start(self, engine):
+        pass
+
+    def on_resume(self, engine):
+        # Sessão restaurada: o estado do motor (incluindo engine.bouts) já está pronto
+        pass
+
+    def on_stop(self, t):
+        pass
+
+    def on_enter(self, zone, t):
+        pass
+
+    def on_exit(self, zone, t):
+        pass
+
+    def on_tick(self, t):
+        pass
+
+
+class ScoringEngine:
+    def __init__(self, n_zones=len(DEFAULT_ZONES), clock=default_clock):
+        self.n_zones = n_zones
+        self.clock = clock
+
+        self.running = False
+        self.duration = 0
+        self.duration_ns = 0
+        self.start_time = None
+        self.stop_time = None
+
+        # Tempo acumulado por zona em ns (índice = id da zona)
+        self.totals = [0] * n_zones
+        # Zona ativa no momento (apenas uma por vez) e instante de entrada nela
+        self.active_zone = None
+        self.enter_time = None
+        # Instante da última transição: eventos com carimbo próprio nunca são anteriores a ele
+        self.last_event_time = None
+
+        self.bouts = BoutLog()
+        self.listeners = []
+
+    def start(self, duration):
+        self.running = True
+        self.duration = duration
+        self.duration_ns = duration * NS_PER_SECOND
+        self.start_time = self.clock()
+        self.stop_time = None
+        self.totals = [0] * self.n_zones
+        self.active_zone = None
+        self.enter_time = None
+        self.last_event_time = self.start_time
+        self.bouts.clear()
+        for listener in self.listeners:
+            listener.on_start(self)
+
+    def resume(self, duration, elapsed_ns, bouts):
+        # Restaura uma sessão interrompida (ex.: recuperada do diário) a partir
+        # das permanências (zona, entrada, saída) em ns relativos ao início.
+        # Os ouvintes recebem apenas on_resume: os eventos já foram registrados
+        self.duration = duration
+        self.duration_ns = duration * NS_PER_SECOND
+        self.start_time = self.clock() - elapsed_ns
+        self.totals = [0] * self.n_zones
+        self.active_zone = None
+        self.enter_time = None
+        self.bouts.clear()
+        self.last_event_time = self.start_time
+        for zone, enter, exit in bouts:
+            self.totals[zone] += exit - enter
+            self.bouts.append(zone, self.start_time + enter, self.start_time + exit)
+            self.last_event_time = max(self.last_event_time, self.start_time + exit)
+        self.running = elapsed_ns < self.duration_ns
+        self.stop_time = None if self.running else self.start_time + self.duration_ns
+        for listener in self.listeners:
+            listener.on_resume(self)
+
+    def stop(self):
+        if not self.running:
+            return
+        now = self._clamp(self.clock())
+        self._close_bout(now)
+        self.stop_time = now
+        self.running = False
+        for listener in self.listeners:
+            listener.on_stop(now)
+
+    def enter(self, zone, t=None):
+        # Entra em uma zona; se outra zona estiver ativa, ela é encerrada antes.
+        # `t` é o instante do evento no relógio do motor (padrão: agora).
+        # Retorna a zona que foi encerrada (ou None)
+        if not self.running or zone == self.active_zone:
+            return None
+        now = self._event_time(t)
+        previous = self.active_zone
+        self._close_bout(now)
+        self.active_zone = zone
+        self.enter_time = now
+        self.last_event_time = now
+        for listener in self.listeners:
+            listener.on_enter(zone, now)
+        return previous
+
+    def exit(self, zone=None, t=None):
+        # Sai da zona ativa (ou apenas de `zone`, se informada). Retorna True se saiu
+        if not self.running or self.active_zone is None:
+            return False
+        if zone is not None and zone != self.active_zone:
+            return False
+        self._close_bout(self._event_time(t))
+        return True
+
+    def toggle(self, zone):
+        if zone == self.active_zone:
+            self.exit(zone)
+        else:
+            self.enter(zone)
+
+    def tick(self):
+        # Retorna o tempo restante do teste em ns (negativo se esgotado)
+        if not self.running:
+            return self.remaining_ns()
+        now = self.clock()
+        for listener in self.listeners:
+            listener.on_tick(now)
+        return self.duration_ns - (now - self.start_time)
+
+    def remaining_ns(self):
+        if self.start_time is None:
+            return 0
+        return self.duration_ns - self.effective_duration_ns()
+
+    def zone_time_ns(self, zone):
+        # Tempo acumulado na zona, incluindo a permanência em andamento
+        total = self.totals[zone]
+        if self.running and zone == self.active_zone:
+            total += self._clamp(self.clock()) - self.enter_time
+        return total
+
+    def effective_duration_ns(self):
+        if self.start_time is None:
+            return 0
+        if self.running:
+            return self.clock() - self.start_time
+        return self.stop_time - self.start_time
+
+    def _event_time(self, t):
+        # Instante de uma transição: o carimbo do evento, se houver, limitado ao
+        # intervalo entre a última transição e agora (e à duração programada)
+        now = self.clock()
+        if t is not None and t < now:
+            now = t if t > self.last_event_time else self.last_event_time
+        return self._clamp(now)
+
+    def _clamp(self, now):
+        # Nenhum tempo é contabilizado além da duração programada, mesmo que a
+        # interface demore a perceber o fim do teste
+        end = self.start_time + self.duration_ns
+        return now if now < end else end
+
+    def _close_bout(self, now):
+        zone = self.active_zone
+        if zone is None:
+            return
+        self.totals[zone] += now - self.enter_time
+        self.bouts.append(zone, self.enter_time, now)
+        self.last_event_time = now
+        self.active_zone = None
+        self.enter_time = None
+        for listener in self.listeners:
+            listener.on_exit(zone, now)
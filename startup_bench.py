@@ -0,0 +1,130 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+# Medição do tempo de abertura dos apps.
+# Cada medida roda num processo novo (nada em cache no interpretador):
+#   importação: tempo para importar o módulo do app
+#   interativo: do início do processo até a janela Tk montada e processada
+#               (requer display; é pulada quando não há)
+# Também confere que o Matplotlib não é carregado na abertura. O resultado é
+# comparado com a linha de base salva (--salvar) ou, sem ela, com limites fixos;
+# o programa termina com código 1 se a abertura regredir ou se um app falhar
+# ao abrir. Cada processo roda num diretório temporário, para o app não
+# restaurar (nem alterar) uma sessão interrompida real de sessoes/.
+
+BASELINE_PATH = "startup_baseline.json"
+DEFAULT_BUDGETS = {  # Limites em segundos quando não há linha de base
+    "openfield importação": 0.5,
+    "openfield interativo": 1.5,
+    "openfield_flet_simple importação": 1.5,
+}
+TOLERANCE = 0.25      # Regressão tolerada em relação à linha de base
+SLACK_SECONDS = 0.02  # Folga absoluta para ruído em medidas muito curtas
+TIMEOUT_SECONDS = 60  # Um app travado na abertura conta como falha
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+IMPORT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start, "matplotlib" in sys.modules)
+"""
+
+INTERACTIVE_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import tkinter as tk
+try:
+    root = tk.Tk()
+except tk.TclError:
+    print(-1, False)
+    sys.exit()
+import openfield
+app = openfield.OpenFieldApp(root)
+root.update()
+print(time.perf_counter() - start, "matplotlib" in sys.modules)
+root.destroy()
+"""
+
+
+def run_script(script):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [APP_DIR, os.environ.get("PYTHONPATH")])))
+    with tempfile.TemporaryDirectory(prefix="openfield_abertura_") as directory:
+        output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True,
+                                cwd=directory, env=env, timeout=TIMEOUT_SECONDS, check=True).stdout
+    seconds, matplotlib_loaded = output.split()
+    return float(seconds), matplotlib_loaded == "True"
+
+
+def measure(repeat):
+    # Melhor de `repeat` execuções: o mínimo é a medida menos sujeita a ruído
+    scripts = {
+        "openfield importação": IMPORT_SCRIPT.format(module="openfield"),
+        "openfield interativo": INTERACTIVE_SCRIPT,
+        "openfield_flet_simple importação": IMPORT_SCRIPT.format(module="openfield_flet_simple"),
+    }
+    results = {}
+    eager = []
+    crashed = []
+    for name, script in scripts.items():
+        try:
+            runs = [run_script(script) for _ in range(repeat)]
+        except subprocess.CalledProcessError as error:
+            last_line = (error.stderr.strip().splitlines() or [f"código {error.returncode}"])[-1]
+            print(f"{name}: falhou ({last_line})")
+            crashed.append(f"{name}: falhou na abertura ({last_line})")
+            continue
+        except subprocess.TimeoutExpired:
+            print(f"{name}: travou")
+            crashed.append(f"{name}: não abriu em {TIMEOUT_SECONDS} s")
+            continue
+        if runs[0][0] < 0:
+            print(f"{name}: sem display, medida pulada")
+            continue
+        results[name] = min(seconds for seconds, _ in runs)
+        if any(loaded for _, loaded in runs):
+            eager.append(name)
+    return results, eager, crashed
+
+
+def check(results, eager, crashed, baseline):
+    failures = list(crashed)
+    failures += [f"{name}: Matplotlib carregado na abertura" for name in eager]
+    for name, seconds in results.items():
+        if name in baseline:
+            limit = baseline[name] * (1 + TOLERANCE) + SLACK_SECONDS
+        else:
+            limit = DEFAULT_BUDGETS[name]
+        status = "ok" if seconds <= limit else "REGRESSÃO"
+        print(f"{name}: {seconds * 1000:.1f} ms (limite {limit * 1000:.1f} ms) {status}")
+        if seconds > limit:
+            failures.append(f"{name}: {seconds * 1000:.1f} ms > {limit * 1000:.1f} ms")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mede o tempo de abertura dos apps e falha se regredir")
+    parser.add_argument("-n", "--repeticoes", type=int, default=5, help="Execuções por medida")
+    parser.add_argument("--salvar", action="store_true", help=f"Salva as medidas como linha de base em {BASELINE_PATH}")
+    args = parser.parse_args()
+
+    results, eager, crashed = measure(args.repeticoes)
+    if args.salvar:
+        with open(BASELINE_PATH, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2, ensure_ascii=False)
+        print(f"Linha de base salva em {BASELINE_PATH}")
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, encoding="utf-8") as file:
+            baseline = json.load(file)
+    failures = check(results, eager, crashed, baseline)
+    if failures:
+        print("Abertura regrediu:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
@@ -0,0 +1,176 @@
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+
+from clock import NS_PER_SECOND, monotonic_clock
+from metrics import LogHistogram
+from zones import DEFAULT_ZONES
+
+# Relógio compartilhado para o modo servidor.
+# Com muitas estações conectadas ao mesmo processo, um único laço atualiza a
+# contagem regressiva e os tempos de todas as sessões ativas numa passada por
+# quadro, em vez de uma corrotina por página acordando por conta própria.
+# Sessões sem teste em andamento saem da lista, e com a lista vazia o laço
+# fica parado. Cada sessão implementa tick_ui() -> bool (False = terminou).
+
+TICK_SECONDS = 0.2
+
+
+class SharedTicker:
+    def __init__(self, interval=TICK_SECONDS, clock=monotonic_clock):
+        self.interval_ns = int(interval * NS_PER_SECOND)
+        self.clock = clock
+        self.sessions = {}  # id -> sessão, na ordem de ativação
+        self.lateness = LogHistogram()   # Atraso do quadro em relação ao previsto (ns)
+        self.pass_time = LogHistogram()  # Duração da passada por todas as sessões (ns)
+        self.running = False
+        self._wake = asyncio.Event()
+        self._loop = None
+
+    def activate(self, session):
+        # Pode ser chamado das threads dos handlers do Flet
+        self.sessions[id(session)] = session
+        if self._loop is None:
+            self._wake.set()
+        else:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def remove(self, session):
+        self.sessions.pop(id(session), None)
+
+    def ensure_running(self, page):
+        # O laço roda no laço de eventos do servidor, iniciado pela primeira sessão
+        if not self.running:
+            self.running = True
+            page.run_task(self.run)
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self.running = True
+        while self.running:
+            self._wake.clear()
+            if not self.sessions:
+                await self._wake.wait()
+                continue
+
+            # Quadros em horários fixos: o atraso de uma passada não se acumula
+            deadline = self.clock()
+            while self.sessions and self.running:
+                now = self.clock()
+                self.lateness.record(max(0, now - deadline))
+                self.tick_once()
+                self.pass_time.record(self.clock() - now)
+                deadline += self.interval_ns
+                now = self.clock()
+                if deadline < now:
+                    deadline = now  # Passada mais longa que o quadro: não tenta recuperar
+                await asyncio.sleep((deadline - now) / NS_PER_SECOND)
+
+    def tick_once(self):
+        for key, session in list(self.sessions.items()):
+            if not session.tick_ui():
+                self.sessions.pop(key, None)
+
+    def stop(self):
+        self.running = False
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def summary(self):
+        lines = []
+        for name, histogram in (("Atraso do quadro", self.lateness), ("Passada por quadro", self.pass_time)):
+            if histogram.count:
+                lines.append(f"{name}: p50 {histogram.quantile(0.5) / 1e6:.3f} ms, "
+                             f"p99 {histogram.quantile(0.99) / 1e6:.3f} ms, "
+                             f"máx {histogram.max / 1e6:.3f} ms ({histogram.count} quadros)")
+        return lines
+
+
+class LoadTestPage:
+    # Página sem cliente para o teste de carga: o app monta e atualiza os
+    # controles como numa página real, as tarefas dele rodam no laço do teste
+    # e os envios ao cliente são apenas contados
+    def __init__(self):
+        self.title = ""
+        self.controls = []
+        self.snack_bar = None
+        self.on_connect = None
+        self.on_disconnect = None
+        self.on_close = None
+        self.updates = 0
+        self.tasks = []
+
+    def add(self, *controls):
+        self.controls.extend(controls)
+
+    def update(self, *controls):
+        self.updates += 1
+
+    def run_task(self, handler, *args):
+        self.tasks.append(asyncio.ensure_future(handler(*args)))
+
+
+async def load_test(n_stations, seconds, duration, interval=TICK_SECONDS, press_probability=0.05,
+                    zones=DEFAULT_ZONES):
+    # Apps reais do modo servidor (diário, relatório e fim do teste incluídos)
+    # ligados a um único relógio compartilhado. Cada estação tem um operador
+    # simulado que marca áreas ao acaso e começa um teste novo quando o
+    # anterior termina, pelos mesmos handlers e, como no Flet, em threads do
+    # executor. Os inícios são espalhados ao longo da primeira duração.
+    # Retorna o relógio (com as medidas por quadro) e os testes encerrados
+    from openfield_flet_simple import OpenFieldApp  # Importa este módulo
+
+    rng = random.Random(0)
+    loop = asyncio.get_running_loop()
+    ticker = SharedTicker(interval)
+    pages = [LoadTestPage() for _ in range(n_stations)]
+    apps = [OpenFieldApp(page, zones=zones, ticker=ticker) for page in pages]
+    next_start = {}
+    for number, app in enumerate(apps):
+        app.animal_id_field.value = f"carga{number}"
+        app.duration_field.value = str(duration)
+        next_start[app] = loop.time() + rng.uniform(0, duration)
+
+    pending = {}  # app -> handler em execução no executor
+    started = 0
+    end = loop.time() + seconds
+    while loop.time() < end:
+        for app in apps:
+            if app in pending and not pending[app].done():
+                continue
+            if not app.engine.running:
+                if loop.time() >= next_start[app]:
+                    pending[app] = loop.run_in_executor(None, app.start_test, None)
+                    next_start[app] = loop.time()
+                    started += 1
+            elif rng.random() < press_probability:
+                pending[app] = loop.run_in_executor(None, app.profiler.runcall, app.toggle_area_button,
+                                                    rng.randrange(len(zones)))
+        await asyncio.sleep(interval)
+
+    ticker.stop()
+    await asyncio.gather(*pending.values())
+    running = sum(app.engine.running for app in apps)
+    for app in apps:
+        app.stop_loops()
+        app.close_journal()
+    await asyncio.gather(*(task for page in pages for task in page.tasks))
+    return ticker, started - running
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Teste de carga do relógio compartilhado do modo servidor")
+    parser.add_argument("--sessoes", type=int, default=300, help="Número de estações simultâneas")
+    parser.add_argument("--segundos", type=float, default=10, help="Duração do teste de carga")
+    parser.add_argument("--duracao", type=int, default=5,
+                        help="Duração de cada teste (s); testes curtos exercitam o fim do teste no relógio")
+    args = parser.parse_args()
+
+    # Diários num diretório temporário, fora das sessões reais
+    os.chdir(tempfile.mkdtemp(prefix="openfield_carga_"))
+    ticker, finished = asyncio.run(load_test(args.sessoes, args.segundos, args.duracao))
+    print(f"{args.sessoes} estações, {finished} testes encerrados, quadro de {TICK_SECONDS * 1000:.0f} ms")
+    for line in ticker.summary():
+        print(line)
@@ -0,0 +1,500 @@
+import argparse
+import math
+import mmap
+import os
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from clock import NS_PER_SECOND, FakeClock
+from journal import ENTER, EXIT
+from locomotion import ARENA_SIDE_CM, locomotion, locomotion_test_data
+from metrics import BoutStats, OccupancyBins
+from pipeline import Pipeline, Stage
+from report import ReportModel, add_locomotion_lines, build_report
+from scoring import ScoringEngine
+from zones import CENTER, CORNER, DEFAULT_ZONES, LATERAL
+
+# Pontuação automática a partir de um vídeo gravado da arena (sem observador).
+# Em cada quadro o animal é localizado por subtração de fundo: o fundo é a
+# mediana de quadros espalhados pelo vídeo (o animal se move, então some da
+# mediana), os pixels que diferem dele além do limiar formam a silhueta e o
+# centróide dela é a posição. Cada posição é classificada em canto, lateral ou
+# centro e as transições alimentam o mesmo motor e as mesmas métricas dos
+# botões, com o relógio avançando pelo instante de cada quadro: o relatório e
+# o test_data saem idênticos aos da marcação manual.
+# O vídeo passa por um fluxo decodificação -> pré-processamento ->
+# localização -> classificação, uma thread por etapa (pipeline.py).
+# A leitura de vídeo usa o OpenCV (opcional, só necessário neste modo);
+# quadros brutos em tons de cinza (.npy ou sem cabeçalho) são mapeados na
+# memória e não precisam dele.
+
+BACKGROUND_SAMPLES = 25
+THRESHOLD = 30     # Diferença mínima de cinza para um pixel ser do animal
+MIN_PIXELS = 20    # Silhuetas menores que isso (no quadro reduzido) são ruído
+WALL_FRACTION = 0.2  # Largura padrão das faixas de parede e dos cantos (fração do menor lado)
+NO_ZONE = -1       # Animal ainda não localizado
+CHUNK = 1 << 16    # Posições por bloco na classificação vetorizada
+BATCH = 256        # Quadros por lote na etapa de classificação do fluxo
+RELEASE_FRAMES = 256  # Quadros brutos já lidos que ficam mapeados antes de serem liberados
+RAW_EXTENSIONS = (".npy", ".raw", ".gray", ".bin")
+
+ArenaGeometry = namedtuple("ArenaGeometry", [
+    "left",    # Limites da arena no quadro (pixels)
+    "top",
+    "right",
+    "bottom",
+    "corner",  # Lado dos quadrados de canto (pixels)
+    "wall",    # Largura da faixa junto às paredes (pixels)
+])
+
+
+def default_geometry(width, height, bounds=None, corner=None, wall=None):
+    left, top, right, bottom = bounds or (0, 0, width, height)
+    side = min(right - left, bottom - top)
+    wall = wall if wall is not None else side * WALL_FRACTION
+    return ArenaGeometry(left, top, right, bottom, corner if corner is not None else wall, wall)
+
+
+def classify_points(x, y, geometry, out=None):
+    # Zona (CORNER, LATERAL ou CENTER) de cada posição, sem laço em Python.
+    # Processa em blocos para que os temporários caibam no cache; posições
+    # NaN (animal não localizado) recebem NO_ZONE
+    x = np.asarray(x)
+    y = np.asarray(y)
+    zones = np.empty(len(x), dtype=np.int8) if out is None else out
+    n = min(len(x), CHUNK)
+    dtype = np.result_type(x, y, np.float32)
+    dx, dy, scratch = (np.empty(n, dtype=dtype) for _ in range(3))
+    near_corner, near_wall, flag = (np.empty(n, dtype=bool) for _ in range(3))
+    for begin in range(0, len(x), CHUNK):
+        end = min(begin + CHUNK, len(x))
+        n = end - begin
+        # Distância até a parede mais próxima em cada eixo
+        np.subtract(x[begin:end], geometry.left, out=dx[:n])
+        np.minimum(dx[:n], np.subtract(geometry.right, x[begin:end], out=scratch[:n]), out=dx[:n])
+        np.subtract(y[begin:end], geometry.top, out=dy[:n])
+        np.minimum(dy[:n], np.subtract(geometry.bottom, y[begin:end], out=scratch[:n]), out=dy[:n])
+
+        np.less(dx[:n], geometry.corner, out=near_corner[:n])
+        near_corner[:n] &= np.less(dy[:n], geometry.corner, out=flag[:n])
+        np.less(dx[:n], geometry.wall, out=near_wall[:n])
+        near_wall[:n] |= np.less(dy[:n], geometry.wall, out=flag[:n])
+
+        chunk = zones[begin:end]
+        chunk.fill(CENTER)
+        chunk[near_wall[:n]] = LATERAL
+        chunk[near_corner[:n]] = CORNER
+        # NaN falha em todas as comparações acima; marcado à parte
+        np.add(dx[:n], dy[:n], out=scratch[:n])
+        chunk[np.isnan(scratch[:n], out=flag[:n])] = NO_ZONE
+    return zones
+
+
+def zone_totals(zones, fps, n_zones=len(DEFAULT_ZONES)):
+    # Tempo em cada zona (s), indexado pelo id da zona como no motor;
+    # quadros sem zona não contam
+    return np.bincount(zones.astype(np.intp) + 1, minlength=n_zones + 1)[1:] / fps
+
+
+def classify_with_totals(x, y, geometry, fps):
+    zones = classify_points(x, y, geometry)
+    return zones, zone_totals(zones, fps)
+
+
+class VideoFrames:
+    # Quadros em tons de cinza de um arquivo de vídeo, reduzidos por `reduce`
+    # em cada eixo (a posição do animal não precisa da resolução inteira)
+    def __init__(self, path, reduce=1):
+        try:
+            import cv2
+        except ImportError:
+            raise RuntimeError("A leitura de vídeo requer o OpenCV (pip install opencv-python)") from None
+        self.cv2 = cv2
+        self.path = path
+        self.reduce = reduce
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise RuntimeError(f"Não foi possível abrir o vídeo {path}")
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) or 30.0
+        self.n_frames = int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.width = int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        if self.n_frames <= 0:
+            # Alguns contêineres não informam o número de quadros (0 ou -1), e
+            # sem ele a duração do teste e a amostra do fundo sairiam erradas:
+            # os quadros são contados numa passada sem conversão das imagens
+            self.n_frames = self._count_frames()
+            if self.n_frames == 0:
+                raise RuntimeError(f"O vídeo {path} não tem quadros legíveis")
+
+    def _count_frames(self):
+        count = 0
+        while self.capture.grab():
+            count += 1
+        # Reabre em vez de voltar ao início: esses contêineres nem sempre aceitam busca
+        self.capture.release()
+        self.capture = self.cv2.VideoCapture(self.path)
+        return count
+
+    def preprocess(self, frame):
+        gray = self.cv2.cvtColor(frame, self.cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        return gray[::self.reduce, ::self.reduce]
+
+    def sample(self, count=BACKGROUND_SAMPLES):
+        # Quadros espalhados pelo vídeo inteiro, para a estimativa do fundo
+        frames = []
+        for index in np.linspace(0, max(self.n_frames - 1, 0), count).astype(int):
+            self.capture.set(self.cv2.CAP_PROP_POS_FRAMES, int(index))
+            ok, frame = self.capture.read()
+            if ok:
+                frames.append(self.preprocess(frame))
+        self.capture.set(self.cv2.CAP_PROP_POS_FRAMES, 0)
+        return frames
+
+    def read(self):
+        # Quadros decodificados, sem pré-processamento
+        while True:
+            ok, frame = self.capture.read()
+            if not ok:
+                return
+            yield frame
+
+    def __iter__(self):
+        return map(self.preprocess, self.read())
+
+    def close(self):
+        self.capture.release()
+
+
+class RawFrames:
+    # Quadros uint8 em tons de cinza gravados sem compressão pelo sistema de
+    # aquisição: um .npy (quadros, altura, largura) ou um arquivo bruto com os
+    # quadros em sequência. O arquivo é mapeado na memória (np.memmap) e cada
+    # quadro entregue é uma view sobre o mapeamento, sem cópia. O kernel é
+    # avisado de que a leitura é sequencial (readahead maior) e os trechos já
+    # processados saem do mapeamento, então o conjunto residente fica pequeno
+    # mesmo com gravações de vários gigabytes (as páginas seguem no cache do
+    # sistema e voltam sem leitura do disco se forem tocadas de novo)
+    def __init__(self, path, reduce=1, frame_size=None, fps=None, offset=0):
+        self.path = path
+        self.reduce = reduce
+        self.fps = fps or 30.0
+        if path.endswith(".npy"):
+            self.frames = np.load(path, mmap_mode="r")
+        else:
+            if frame_size is None:
+                raise RuntimeError(f"{path}: informe o tamanho dos quadros brutos (--quadro LARGURA ALTURA)")
+            width, height = frame_size
+            n_frames = (os.path.getsize(path) - offset) // (width * height)
+            self.frames = np.memmap(path, dtype=np.uint8, mode="r", offset=offset,
+                                    shape=(n_frames, height, width))
+        if self.frames.ndim != 3 or self.frames.dtype != np.uint8:
+            raise RuntimeError(f"{path}: esperados quadros uint8 (quadros, altura, largura), "
+                               f"encontrado {self.frames.dtype} {self.frames.shape}")
+        self.n_frames, self.height, self.width = self.frames.shape
+
+        # Posição do primeiro quadro dentro do mmap (o memmap alinha o início do mapeamento)
+        self._mmap = getattr(self.frames, "_mmap", None)
+        self._base = getattr(self.frames, "offset", 0) % mmap.ALLOCATIONGRANULARITY
+        self._frame_bytes = self.height * self.width
+        self._advise(getattr(mmap, "MADV_SEQUENTIAL", None), 0, self._base + self.frames.nbytes)
+
+    def _advise(self, option, start, end):
+        if self._mmap is None or option is None or not hasattr(self._mmap, "madvise"):
+            return
+        start -= start % mmap.PAGESIZE
+        if end > start:
+            self._mmap.madvise(option, start, end - start)
+
+    def preprocess(self, frame):
+        return frame[::self.reduce, ::self.reduce]
+
+    def sample(self, count=BACKGROUND_SAMPLES):
+        indexes = np.linspace(0, max(self.n_frames - 1, 0), count).astype(int)
+        return [self.preprocess(self.frames[index]) for index in indexes]
+
+    def read(self):
+        release = getattr(mmap, "MADV_DONTNEED", None)
+        for index in range(self.n_frames):
+            if index % RELEASE_FRAMES == 0 and index > RELEASE_FRAMES:
+                self._advise(release, 0, self._base + (index - RELEASE_FRAMES) * self._frame_bytes)
+            yield self.frames[index]
+
+    def __iter__(self):
+        return map(self.preprocess, self.read())
+
+    def close(self):
+        self.frames = None
+        self._mmap = None
+
+
+def open_frames(path, reduce=1, frame_size=None, fps=None):
+    # Quadros brutos mapeados na memória ou vídeo comprimido (OpenCV)
+    if frame_size is not None or path.lower().endswith(RAW_EXTENSIONS):
+        return RawFrames(path, reduce, frame_size, fps)
+    video = VideoFrames(path, reduce)
+    if fps:
+        video.fps = fps
+    return video
+
+
+def estimate_background(frames):
+    return np.median(np.stack(frames), axis=0).astype(np.uint8)
+
+
+class Locator:
+    # Posição do animal (centróide da silhueta) em coordenadas do quadro
+    # original; NaN quando não há silhueta suficiente
+    def __init__(self, background, reduce=1, threshold=THRESHOLD, min_pixels=MIN_PIXELS):
+        self.background = background
+        self.reduce = reduce
+        self.threshold = threshold
+        self.min_pixels = min_pixels
+        height, width = background.shape
+        # Centro de cada pixel reduzido no quadro original
+        self.xs = (np.arange(width) + 0.5) * reduce
+        self.ys = (np.arange(height) + 0.5) * reduce
+
+    def locate(self, frame):
+        # Diferença absoluta em uint8 (sem conversão para um tipo maior)
+        diff = np.maximum(frame, self.background)
+        diff -= np.minimum(frame, self.background)
+        mask = diff > self.threshold
+        cols = np.count_nonzero(mask, axis=0)
+        count = cols.sum()
+        if count < self.min_pixels:
+            return math.nan, math.nan
+        rows = np.count_nonzero(mask, axis=1)
+        return cols @ self.xs / count, rows @ self.ys / count
+
+
+def track(frames, locator):
+    # Trajetória (n, 2) em pixels do quadro original
+    return np.array([locator.locate(frame) for frame in frames], dtype=np.float64).reshape(-1, 2)
+
+
+def fill_lost(zones, previous=NO_ZONE):
+    # Quadros sem detecção mantêm a última zona conhecida (`previous` antes do primeiro)
+    found = zones != NO_ZONE
+    last_found = np.maximum.accumulate(np.where(found, np.arange(len(zones)), -1))
+    filled = zones[np.maximum(last_found, 0)]
+    filled[last_found < 0] = previous
+    return filled
+
+
+def classify_trajectory(positions, geometry):
+    # Zona de cada quadro; quadros sem detecção mantêm a zona anterior
+    return fill_lost(classify_points(positions[:, 0], positions[:, 1], geometry))
+
+
+def zone_events(frame_zones, frame_ns, first_frame=0, previous=NO_ZONE):
+    # Eventos (tipo, zona, ns desde o início) das trocas de zona, na forma do
+    # diário: a saída de uma zona vem antes da entrada na seguinte
+    events = []
+    changes = np.flatnonzero(np.diff(frame_zones, prepend=np.int8(previous)))
+    for index, zone in zip(changes.tolist(), frame_zones[changes].tolist()):
+        t = int((first_frame + index) * frame_ns)
+        if previous != NO_ZONE:
+            events.append((EXIT, previous, t))
+        if zone != NO_ZONE:
+            events.append((ENTER, zone, t))
+        previous = zone
+    return events
+
+
+class ZoneEvents:
+    # Etapa de classificação do fluxo: junta as posições em lotes para o
+    # classificador vetorizado e emite os eventos das trocas de zona.
+    # Guarda a trajetória (16 bytes por quadro, ~6 MB por hora a 30 qps)
+    def __init__(self, geometry, fps, batch=BATCH):
+        self.geometry = geometry
+        self.frame_ns = NS_PER_SECOND / fps
+        self.batch = batch
+        self.pending = []
+        self.chunks = []
+        self.n_frames = 0
+        self.lost_frames = 0
+        self.zone = NO_ZONE
+
+    def process(self, position):
+        self.pending.append(position)
+        if len(self.pending) < self.batch:
+            return ()
+        return self._flush()
+
+    def finish(self):
+        return self._flush()
+
+    def _flush(self):
+        if not self.pending:
+            return ()
+        positions = np.array(self.pending, dtype=np.float64).reshape(-1, 2)
+        self.pending = []
+        self.chunks.append(positions)
+        zones = classify_points(positions[:, 0], positions[:, 1], self.geometry)
+        self.lost_frames += int(np.count_nonzero(zones == NO_ZONE))
+        zones = fill_lost(zones, self.zone)
+        events = zone_events(zones, self.frame_ns, self.n_frames, self.zone)
+        self.n_frames += len(zones)
+        self.zone = int(zones[-1])
+        return events
+
+    def trajectory(self):
+        return np.concatenate(self.chunks) if self.chunks else np.empty((0, 2))
+
+
+class TrackingSession:
+    # Sessão pontuada a partir da trajetória: mesmo motor, métricas e relatório do app
+    def __init__(self, animal_id, zones=DEFAULT_ZONES):
+        self.animal_id = animal_id
+        self.zones = zones
+        self.clock = FakeClock()
+        self.engine = ScoringEngine(n_zones=len(zones), clock=self.clock)
+        self.occupancy = OccupancyBins(len(zones))
+        self.engine.listeners.append(self.occupancy)
+        self.bout_stats = BoutStats(len(zones))
+        self.engine.listeners.append(self.bout_stats)
+        self.report = ReportModel()
+        self.test_data = {}
+        self.n_frames = 0
+        self.lost_frames = 0
+        self.locomotion = None
+
+    def start(self, duration):
+        self.clock.now_ns = 0
+        self.engine.start(duration)
+
+    def apply(self, events):
+        # Eventos (tipo, zona, ns desde o início) entregues ao motor com o
+        # relógio no instante de cada um, como os cliques nos botões
+        for kind, zone, t in events:
+            self.clock.now_ns = t
+            if kind == ENTER:
+                self.engine.enter(zone)
+            elif kind == EXIT:
+                self.engine.exit(zone)
+
+    def finish(self, n_frames, fps):
+        self.n_frames = n_frames
+        self.clock.now_ns = int(n_frames * NS_PER_SECOND / fps)
+        self.engine.stop()
+
+    def generate_report(self):
+        # Mesmo relatório e mesmas chaves de test_data dos apps, mais os
+        # quadros analisados e a locomoção
+        self.test_data = build_report(self.report, self.engine, self.zones, self.occupancy, self.bout_stats,
+                                      self.animal_id, extra=self._report_extra)
+        self.test_data["Quadros Analisados"] = self.n_frames
+        self.test_data["Quadros sem Detecção"] = self.lost_frames
+        if self.locomotion is not None:
+            self.test_data.update(locomotion_test_data(self.zones, self.locomotion))
+        return self.report.text()
+
+    def _report_extra(self, report):
+        report.line("frames", "Quadros Analisados: {} ({} sem detecção)", self.n_frames, self.lost_frames)
+        if self.locomotion is not None:
+            report.line(("blank", "locomotion"), "")
+            add_locomotion_lines(report, self.zones, self.locomotion)
+
+
+def add_locomotion(session, positions, geometry, fps, arena_side_cm=ARENA_SIDE_CM):
+    # Locomoção nos quadros dentro da duração pontuada, na escala da arena
+    n = min(len(positions), int(round(session.engine.effective_duration_ns() * fps / NS_PER_SECOND)))
+    positions = positions[:n]
+    session.locomotion = locomotion(positions, classify_trajectory(positions, geometry), fps,
+                                    arena_side_cm / (geometry.right - geometry.left),
+                                    len(session.zones), session.occupancy.bin_seconds)
+
+
+def track_video(path, animal_id, geometry_args, reduce=2, threshold=THRESHOLD,
+                min_pixels=MIN_PIXELS, duration=None, frame_size=None, fps=None,
+                arena_side_cm=ARENA_SIDE_CM):
+    # Retorna a sessão pontuada, a trajetória e o fluxo (com as medidas por etapa)
+    video = open_frames(path, reduce, frame_size, fps)
+    try:
+        background = estimate_background(video.sample())
+        locator = Locator(background, reduce, threshold, min_pixels)
+        geometry = default_geometry(video.width, video.height, *geometry_args)
+        classifier = ZoneEvents(geometry, video.fps)
+        pipeline = Pipeline(video.read(), [
+            Stage("pré-processamento", lambda frame: (video.preprocess(frame),)),
+            Stage("localização", lambda frame: (locator.locate(frame),)),
+            Stage("classificação", classifier.process, classifier.finish),
+        ], source_name="decodificação")
+
+        session = TrackingSession(animal_id)
+        session.start(duration or max(1, math.ceil(video.n_frames / video.fps)))
+        session.apply(pipeline)
+        session.finish(classifier.n_frames, video.fps)
+        session.lost_frames = classifier.lost_frames
+    finally:
+        video.close()
+    positions = classifier.trajectory()
+    add_locomotion(session, positions, geometry, video.fps, arena_side_cm)
+    return session, positions, pipeline
+
+
+def benchmark(n_points, repeat=5):
+    # Posições sintéticas uniformes numa arena de 640x480 (1 em 1000 perdida)
+    rng = np.random.default_rng(0)
+    x = rng.uniform(0, 640, n_points)
+    y = rng.uniform(0, 480, n_points)
+    x[::1000] = np.nan
+    geometry = default_geometry(640, 480)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        classify_with_totals(x, y, geometry, 30)
+        best = min(best, time.perf_counter() - start)
+    return n_points / best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pontua uma sessão a partir do vídeo gravado da arena")
+    parser.add_argument("video", nargs="?", help="Vídeo da sessão ou quadros brutos em tons de cinza (.npy, .raw)")
+    parser.add_argument("--id", help="ID do animal (padrão: nome do arquivo)")
+    parser.add_argument("--duracao", type=int, help="Duração programada do teste em s (padrão: a do vídeo)")
+    parser.add_argument("--arena", type=float, nargs=4, metavar=("ESQ", "TOPO", "DIR", "BASE"),
+                        help="Limites da arena no quadro, em pixels (padrão: o quadro inteiro)")
+    parser.add_argument("--canto", type=float, help="Lado dos cantos em pixels (padrão: igual à faixa de parede)")
+    parser.add_argument("--parede", type=float, help=f"Largura da faixa de parede em pixels (padrão: {WALL_FRACTION * 100:.0f}%% do menor lado)")
+    parser.add_argument("--lado-cm", type=float, default=ARENA_SIDE_CM,
+                        help="Largura real da arena em cm, para a distância e a velocidade")
+    parser.add_argument("--limiar", type=int, default=THRESHOLD, help="Diferença de cinza em relação ao fundo")
+    parser.add_argument("--reducao", type=int, default=2, help="Fator de redução do quadro em cada eixo")
+    parser.add_argument("--quadro", type=int, nargs=2, metavar=("LARGURA", "ALTURA"),
+                        help="Tamanho dos quadros de um arquivo bruto sem cabeçalho")
+    parser.add_argument("--qps", type=float, help="Quadros por segundo (padrão: o do vídeo; 30 para quadros brutos)")
+    parser.add_argument("-o", "--output", help="Arquivo do relatório (padrão: relatorio_openfield_<id>_<data>.txt)")
+    parser.add_argument("--bench", type=int, metavar="N", help="Mede a vazão do classificador com N posições sintéticas")
+    args = parser.parse_args()
+
+    if args.bench:
+        print(f"{benchmark(args.bench) / 1e6:.1f} milhões de posições/s")
+    if not args.video:
+        sys.exit()
+
+    animal_id = args.id or os.path.splitext(os.path.basename(args.video))[0]
+    start = time.perf_counter()
+    try:
+        session, positions, pipeline = track_video(args.video, animal_id, (args.arena, args.canto, args.parede),
+                                         reduce=args.reducao, threshold=args.limiar, duration=args.duracao,
+                                         frame_size=args.quadro, fps=args.qps, arena_side_cm=args.lado_cm)
+    except RuntimeError as error:
+        print(error, file=sys.stderr)
+        sys.exit(1)
+    elapsed = time.perf_counter() - start
+
+    text = session.generate_report()
+    output = args.output or f"relatorio_openfield_{animal_id}_{time.strftime('%Y%m%d_%H%M%S')}.txt"
+    with open(output, "w", encoding="utf-8") as file:
+        file.write(text)
+    print(text, end="")
+    video_seconds = session.engine.effective_duration_ns() / NS_PER_SECOND
+    for line in pipeline.summary():
+        print(line)
+    print(f"{len(positions)} quadros em {elapsed:.1f} s ({video_seconds / elapsed:.1f}x o tempo real); "
+          f"relatório em {output}")
@@ -0,0 +1,245 @@
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from collections import deque
+
+from clock import NS_PER_SECOND, default_clock
+from metrics import LogHistogram
+from zones import ARENAS
+
+# Sessão roteirizada nos widgets reais do app, para medir a latência de ponta
+# a ponta da interface (os benchmarks do motor não veem o custo dos widgets).
+# Uma linha do tempo de pressões/solturas é tocada no OpenFieldApp:
+#   Tkinter: event_generate nos botões das áreas (o evento entra na fila do Tk
+#            como um clique real)
+#   Flet: on_click dos botões chamado numa thread do executor, como o Flet faz
+# Mede a latência por evento (até o fim do handler e até a tela/cliente ser
+# atualizado), atualizações dos rótulos de tempo atrasadas ou perdidas, e o
+# tempo de generate_report e do gráfico.
+
+SAMPLE_MS = 50           # Amostragem do rótulo da área ativa
+LATE_GAP_NS = 500_000_000  # Rótulo sem mudar por mais que isso (com área ativa) = atualização atrasada
+DEADLINE_NS = 1_000_000_000  # Evento sem efeito na interface após isso = perdido
+
+
+def make_timeline(n_zones, duration, rng, mean_bout=2.0, mean_gap=0.5):
+    # Permanências alternadas: (instante em ns desde o início, zona, pressionar?)
+    timeline = []
+    t = rng.expovariate(1 / mean_gap)
+    while True:
+        bout = rng.expovariate(1 / mean_bout)
+        if t + bout >= duration:
+            return timeline
+        zone = rng.randrange(n_zones)
+        timeline.append((int(t * NS_PER_SECOND), zone, True))
+        timeline.append((int((t + bout) * NS_PER_SECOND), zone, False))
+        t += bout + rng.expovariate(1 / mean_gap)
+
+
+class DriverStats:
+    def __init__(self, clock=default_clock):
+        self.clock = clock
+        self.handled = LogHistogram()    # Disparo -> fim do handler
+        self.displayed = LogHistogram()  # Disparo -> tela redesenhada / cliente atualizado
+        self.label_gaps = LogHistogram() # Intervalo entre mudanças do rótulo da área ativa
+        self.report = LogHistogram()
+        self.chart = LogHistogram()
+        self.events = 0
+        self.dropped = 0
+        self.late_labels = 0
+        self._label = None
+        self._label_changed = None
+
+    def timed(self, histogram, func):
+        # Envolve um método do app para medir cada chamada
+        def wrapper(*args, **kwargs):
+            start = self.clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.record(self.clock() - start)
+        return wrapper
+
+    def sample_label(self, text, active):
+        now = self.clock()
+        if not active:
+            self._label = None
+            return
+        if text != self._label:
+            if self._label is not None:
+                self.label_gaps.record(now - self._label_changed)
+            self._label = text
+            self._label_changed = now
+        elif now - self._label_changed > LATE_GAP_NS:
+            self.late_labels += 1
+            self._label_changed = now  # Conta uma vez por atraso
+
+    def summary(self):
+        lines = [f"Eventos: {self.events}, perdidos: {self.dropped}, rótulos atrasados: {self.late_labels}"]
+        for name, histogram in (("Evento -> handler", self.handled), ("Evento -> tela", self.displayed),
+                                ("Intervalo do rótulo", self.label_gaps), ("generate_report", self.report),
+                                ("Gráfico", self.chart)):
+            if histogram.count:
+                lines.append(f"{name}: p50 {histogram.quantile(0.5) / 1e6:.2f} ms, "
+                             f"p99 {histogram.quantile(0.99) / 1e6:.2f} ms, "
+                             f"máx {histogram.max / 1e6:.2f} ms ({histogram.count})")
+        return lines
+
+
+def isolate_journals():
+    # Diretório temporário: os diários da sessão roteirizada não se misturam
+    # aos reais (nem são restaurados como sessão interrompida)
+    os.chdir(tempfile.mkdtemp(prefix="openfield_roteiro_"))
+
+
+def drive_tk(zones, timeline, duration):
+    import tkinter as tk
+    from openfield import OpenFieldApp
+
+    isolate_journals()
+    root = tk.Tk()
+    app = OpenFieldApp(root, zones=zones)
+    stats = DriverStats(app.engine.clock)
+    app.generate_report = stats.timed(stats.report, app.generate_report)
+    app.show_pie_chart = stats.timed(stats.chart, app.show_pie_chart)
+
+    # id do botão -> eventos disparados ainda não tratados, em ordem:
+    # (instante do disparo, pressão?, número do evento)
+    pending = {str(button): deque() for button in app.area_buttons}
+
+    def on_handled(event):
+        # Ligado depois do handler do app (add="+"): roda quando ele termina,
+        # então o relevo do botão já mostra o efeito deste evento (e não o de
+        # um evento posterior do roteiro)
+        queue = pending.get(str(event.widget))
+        if not queue:
+            return
+        fired, press, _ = queue.popleft()
+        now = stats.clock()
+        stats.handled.record(now - fired)
+        if app.engine.running and event.widget.cget("relief") != ("sunken" if press else "raised"):
+            stats.dropped += 1
+        root.after_idle(lambda: stats.displayed.record(stats.clock() - fired))
+
+    for button in app.area_buttons:
+        button.bind("<ButtonPress-1>", on_handled, add="+")
+        button.bind("<ButtonRelease-1>", on_handled, add="+")
+
+    def fire(zone, press):
+        button = app.area_buttons[zone]
+        stats.events += 1
+        pending[str(button)].append((stats.clock(), press, stats.events))
+        event_ms = int(time.monotonic() * 1000) & 0xFFFFFFFF
+        button.event_generate("<ButtonPress-1>" if press else "<ButtonRelease-1>", when="tail",
+                              x=5, y=5, time=event_ms)
+        root.after(DEADLINE_NS // 1_000_000, verify, str(button), stats.events)
+
+    def verify(key, number):
+        # Evento cujo handler não rodou até o prazo = perdido
+        queue = pending[key]
+        if queue and queue[0][2] == number:
+            queue.popleft()
+            stats.dropped += 1
+
+    def sample():
+        active = app.engine.active_zone
+        stats.sample_label(app.area_time_labels[active].cget("text") if active is not None else None,
+                           active is not None)
+        root.after(SAMPLE_MS, sample)
+
+    def finish():
+        app.stop_test(manual_stop=False)
+        root.quit()
+
+    app.animal_id.set("roteiro")
+    app.test_duration.set(int(duration) + 5)
+    app.start_test()
+    for t_ns, zone, press in timeline:
+        root.after(t_ns // 1_000_000, fire, zone, press)
+    root.after(SAMPLE_MS, sample)
+    root.after(int(duration * 1000) + 500, finish)
+    root.mainloop()
+    root.destroy()
+    return stats
+
+
+def drive_flet(zones, timeline, duration):
+    import flet as ft
+    from openfield_flet_simple import OpenFieldApp
+
+    isolate_journals()
+    result = {}
+
+    async def play(app, page, stats):
+        loop = asyncio.get_running_loop()
+        origin = stats.clock()
+
+        async def sampler():
+            while app.engine.running:
+                active = app.engine.active_zone
+                stats.sample_label(app.area_time_texts[active].value if active is not None else None,
+                                   active is not None)
+                await asyncio.sleep(SAMPLE_MS / 1000)
+
+        sampling = asyncio.create_task(sampler())
+        for t_ns, zone, press in timeline:
+            delay = (origin + t_ns - stats.clock()) / NS_PER_SECOND
+            if delay > 0:
+                await asyncio.sleep(delay)
+            stats.events += 1
+            fired = stats.clock()
+            flushes = app.updates.flushes
+            await loop.run_in_executor(None, app.area_buttons[zone].on_click, None)
+            stats.handled.record(stats.clock() - fired)
+
+            # Enviado ao cliente quando o agendador faz a próxima atualização agrupada
+            while app.updates.flushes == flushes and stats.clock() - fired < DEADLINE_NS:
+                await asyncio.sleep(0.001)
+            if app.updates.flushes == flushes or (app.engine.active_zone == zone) != press:
+                stats.dropped += 1
+            else:
+                stats.displayed.record(stats.clock() - fired)
+
+        await asyncio.sleep(max(0, (origin + int(duration * NS_PER_SECOND) - stats.clock()) / NS_PER_SECOND))
+        await loop.run_in_executor(None, lambda: app.stop_test(manual_stop=False))
+        await sampling
+        result["stats"] = stats
+        if hasattr(page, "window"):
+            page.window.destroy()
+        else:
+            page.window_destroy()  # Flet < 0.23
+
+    def main(page):
+        app = OpenFieldApp(page, zones=zones)
+        stats = DriverStats(app.engine.clock)
+        app.generate_report = stats.timed(stats.report, app.generate_report)
+        app.show_pie_chart = stats.timed(stats.chart, app.show_pie_chart)
+        app.animal_id_field.value = "roteiro"
+        app.duration_field.value = str(int(duration) + 5)
+        app.start_test(None)
+        page.run_task(play, app, page, stats)
+
+    ft.app(target=main)
+    return result.get("stats")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sessão roteirizada nos widgets reais para medir a latência da interface")
+    parser.add_argument("interface", choices=["tk", "flet"])
+    parser.add_argument("--segundos", type=float, default=30, help="Duração da sessão roteirizada")
+    parser.add_argument("--permanencia", type=float, default=2.0, help="Duração média de cada permanência (s)")
+    parser.add_argument("--arena", choices=sorted(ARENAS), default="padrao")
+    parser.add_argument("--semente", type=int, default=0)
+    args = parser.parse_args()
+
+    zones = ARENAS[args.arena]
+    timeline = make_timeline(len(zones), args.segundos, random.Random(args.semente), mean_bout=args.permanencia)
+
+    drive = drive_tk if args.interface == "tk" else drive_flet
+    stats = drive(zones, timeline, args.segundos)
+    if stats is not None:
+        for line in stats.summary():
+            print(line)
@@ -0,0 +1,65 @@
+from collections import namedtuple
+
+# Tabela de configuração das áreas (zonas) da arena.
+# O id de cada zona é a sua posição na tabela; o motor de pontuação e as
+# interfaces guardam o estado em listas indexadas por esse id, então
+# nenhuma parte do código depende de quantas zonas existem.
+
+Zone = namedtuple("Zone", [
+    "name",        # Nome exibido no botão e no relatório
+    "article",     # Artigo usado nos rótulos ("Tempo no Canto", "Tempo na Lateral")
+    "color",       # Cor do botão no Tkinter e da fatia no gráfico
+    "fg",          # Cor do texto do botão no Tkinter
+    "flet_color",  # Cor do botão na versão Flet
+    "row",         # Posição do botão na grade da interface
+    "col",
+    "colspan",
+    "category",    # Classificação clássica da área: CORNER, LATERAL ou CENTER
+])
+
+CORNER = 0
+LATERAL = 1
+CENTER = 2
+
+DEFAULT_ZONES = (
+    Zone("Canto", "no", "red", "white", "#F44336", 0, 0, 1, CORNER),
+    Zone("Lateral", "na", "skyblue", "black", "#2196F3", 0, 1, 1, LATERAL),
+    Zone("Centro", "no", "forestgreen", "white", "#4CAF50", 1, 0, 2, CENTER),
+)
+
+
+def zone_label(zone):
+    return f"Tempo {zone.article} {zone.name}"
+
+
+def grid_zones(rows, cols=None):
+    # Arena dividida em quadrantes (ex.: 3x3, 5x5); cada quadrante é uma zona.
+    # As cores seguem a classificação clássica: cantos, laterais e centro
+    cols = cols or rows
+    zones = []
+    for r in range(rows):
+        for c in range(cols):
+            on_row_edge = r in (0, rows - 1)
+            on_col_edge = c in (0, cols - 1)
+            category = (CORNER if on_row_edge and on_col_edge
+                        else LATERAL if on_row_edge or on_col_edge
+                        else CENTER)
+            base = DEFAULT_ZONES[category]
+            number = r * cols + c + 1
+            zones.append(Zone(f"Q{number}", "no", base.color, base.fg, base.flet_color, r, c, 1, category))
+    return tuple(zones)
+
+
+ARENAS = {
+    "padrao": DEFAULT_ZONES,
+    "3x3": grid_zones(3),
+    "5x5": grid_zones(5),
+}
+
+
+def arena_for(n_zones):
+    # Tabela de zonas com o número de zonas informado (ex.: lido de um diário)
+    for zones in ARENAS.values():
+        if len(zones) == n_zones:
+            return zones
+    raise ValueError(f"Nenhuma arena conhecida tem {n_zones} zonas")